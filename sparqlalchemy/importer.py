@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# Copyright 2017 Guenter Bartsch, Heiko Schaefer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+#
+# parallel import of RDF files into a sparqlalchemy store
+#
+# usage: python -m sparqlalchemy.importer [options] <db_url> <tablename> <file or directory> ...
+#
+
+from __future__ import absolute_import
+
+import os
+import sys
+import gzip
+import traceback
+import logging
+import threading
+import Queue
+import multiprocessing
+
+from time     import time
+from optparse import OptionParser
+
+import rdflib
+from rdflib.util import guess_format
+
+from sparqlalchemy.sparqlalchemy import SPARQLAlchemyStore
+
+IMPORT_BATCH_SIZE = 10000
+IMPORT_POLL_TIME  = 1.0 # seconds to wait for batches before checking on the worker processes
+
+QUAD_FORMATS      = set(['nquads', 'trig'])
+
+def guess_file_format(fn):
+    """guess RDF format from file name, e.g. mirror/dbr_Stuttgart_1.turtle -> turtle"""
+
+    if fn.endswith('.gz'):
+        fn = fn[:-3]
+
+    if fn.endswith('.turtle'):
+        return 'turtle'
+
+    return guess_format(fn) or 'turtle'
+
+#
+# worker processes: parse files, send quad batches to the parent process
+#
+
+_batch_queue = None
+
+def _init_worker(batch_queue):
+    global _batch_queue
+    _batch_queue = batch_queue
+
+def _parse_file(args):
+
+    fn, format, context, batch_size = args
+
+    try:
+
+        start_time = time()
+
+        cj = rdflib.ConjunctiveGraph()
+
+        f = gzip.open(fn, 'rb') if fn.endswith('.gz') else open(fn, 'rb')
+        try:
+            if format in QUAD_FORMATS:
+                cj.parse(file=f, format=format)
+            else:
+                cj.get_context(context).parse(file=f, format=format)
+        finally:
+            f.close()
+
+        parse_time = time() - start_time
+
+        cnt   = 0
+        batch = []
+        for s, p, o, c in cj.quads():
+            batch.append((s, p, o, c.identifier))
+            if len(batch) >= batch_size:
+                _batch_queue.put(('batch', fn, batch))
+                cnt  += len(batch)
+                batch = []
+
+        if batch:
+            _batch_queue.put(('batch', fn, batch))
+            cnt += len(batch)
+
+        _batch_queue.put(('done', fn, cnt, parse_time))
+
+    except:
+        _batch_queue.put(('error', fn, traceback.format_exc()))
+
+def import_files(store, files, context=u'http://example.com', format=None, jobs=None, writers=1, batch_size=IMPORT_BATCH_SIZE):
+    """
+    import RDF files into store in parallel.
+
+    Files are parsed in a pool of worker processes (rdflib parsing is CPU bound),
+    parsed quads are streamed back in batches and written to the store by one
+    or more writer threads, each using its own connection.
+
+    store      -- target SPARQLAlchemyStore
+    files      -- list of file names (gzip compressed if they end in .gz)
+    context    -- graph context for triples from non-quad formats
+    format     -- rdflib format name, guessed from file extension if None
+    jobs       -- number of parser processes, defaults to the number of cores
+    writers    -- number of writer threads (keep this at 1 for SQLite)
+
+    returns the number of quads written
+    """
+
+    if not jobs:
+        jobs = multiprocessing.cpu_count()
+
+    batch_queue = multiprocessing.Queue(4 * jobs)
+    write_queue = Queue.Queue(2 * writers)
+
+    stats_lock  = threading.Lock()
+    stats       = {'written': 0}
+    errors      = []
+
+    def writer():
+
+        graphs = {}
+
+        while True:
+
+            batch = write_queue.get()
+            if batch is None:
+                break
+
+            try:
+                quads = []
+                for s, p, o, c in batch:
+                    if not c in graphs:
+                        graphs[c] = rdflib.Graph(identifier=c)
+                    quads.append((s, p, o, graphs[c]))
+
+                store.addN(quads)
+
+                with stats_lock:
+                    stats['written'] += len(quads)
+
+            except:
+                logging.error(traceback.format_exc())
+                errors.append('write failed: %s' % traceback.format_exc())
+
+    threads = []
+    for i in range(writers):
+        t = threading.Thread(target=writer)
+        t.daemon = True
+        t.start()
+        threads.append(t)
+
+    start_time = time()
+
+    pool    = multiprocessing.Pool(jobs, _init_worker, (batch_queue,))
+    workers = set([ p.pid for p in multiprocessing.active_children() ])
+    result  = pool.map_async(_parse_file, [ (fn, format or guess_file_format(fn), context, batch_size) for fn in files ])
+
+    pending = len(files)
+    idle    = False
+    while pending > 0:
+
+        # workers failing outside of _parse_file()'s error handling never report back:
+        # the pool replaces workers which died (their files are lost), exceptions show up
+        # in the map result once all files are through
+
+        try:
+            msg = batch_queue.get(timeout=IMPORT_POLL_TIME)
+        except Queue.Empty:
+
+            if set([ p.pid for p in multiprocessing.active_children() ]) - workers:
+                errors.append('a parser process died, %d files not imported' % pending)
+                pool.terminate()
+                break
+
+            if result.ready():
+
+                if not result.successful():
+                    try:
+                        result.get()
+                    except:
+                        errors.append('parser failed: %s' % traceback.format_exc())
+                    break
+
+                # all files are through, allow one more round for messages still in transit
+
+                if idle:
+                    errors.append('%d files not reported back by the parsers' % pending)
+                    break
+                idle = True
+
+            continue
+
+        if msg[0] == 'batch':
+            write_queue.put(msg[2])
+
+        elif msg[0] == 'done':
+            pending -= 1
+            fn, cnt, parse_time = msg[1:]
+            logging.info('%s: %d triples parsed in %.1fs (%.0f triples/s)' % (fn, cnt, parse_time, cnt / parse_time if parse_time > 0 else 0.0))
+
+        else:
+            pending -= 1
+            logging.error('%s: %s' % (msg[1], msg[2]))
+            errors.append('%s: %s' % (msg[1], msg[2]))
+
+    pool.close()
+    pool.join()
+
+    for t in threads:
+        write_queue.put(None)
+    for t in threads:
+        t.join()
+
+    elapsed = time() - start_time
+    logging.info('total: %d triples from %d files in %.1fs (%.0f triples/s)' % (stats['written'], len(files), elapsed, stats['written'] / elapsed if elapsed > 0 else 0.0))
+
+    if errors:
+        raise Exception ('import_files: %d errors, first one: %s' % (len(errors), errors[0]))
+
+    return stats['written']
+
+def main():
+
+    option_parser = OptionParser("usage: %prog [options] <db_url> <tablename> <file or directory> [...]")
+
+    option_parser.add_option ("-b", "--batch-size", dest="batch_size", type="int", default=IMPORT_BATCH_SIZE,
+                       help="quads per batch, default: %d" % IMPORT_BATCH_SIZE)
+    option_parser.add_option ("-c", "--context", dest="context", default=u'http://example.com',
+                       help="graph context, default: http://example.com")
+    option_parser.add_option ("-d", "--dict-encoding", action="store_true", dest="dict_encoding",
+                       help="use dictionary encoded store layout")
+    option_parser.add_option ("-f", "--format", dest="format",
+                       help="rdflib format, default: guess from file extension")
+    option_parser.add_option ("-j", "--jobs", dest="jobs", type="int", default=multiprocessing.cpu_count(),
+                       help="parser processes, default: %d" % multiprocessing.cpu_count())
+    option_parser.add_option ("-w", "--writers", dest="writers", type="int", default=1,
+                       help="writer connections, default: 1")
+    option_parser.add_option ("-v", "--verbose", action="store_true", dest="verbose",
+                       help="verbose output")
+
+    (options, args) = option_parser.parse_args()
+
+    if len(args) < 3:
+        option_parser.print_help()
+        sys.exit(1)
+
+    if options.verbose:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.basicConfig(level=logging.INFO)
+
+    db_url    = args[0]
+    tablename = args[1]
+
+    files = []
+    for path in args[2:]:
+        if os.path.isdir(path):
+            for fn in sorted(os.listdir(path)):
+                if os.path.isfile(os.path.join(path, fn)):
+                    files.append(os.path.join(path, fn))
+        else:
+            files.append(path)
+
+    store = SPARQLAlchemyStore(db_url, tablename, dict_encoding=options.dict_encoding)
+
+    import_files(store, files, context=unicode(options.context), format=options.format, jobs=options.jobs,
+                 writers=options.writers, batch_size=options.batch_size)
+
+if __name__ == "__main__":
+    main()
+
@@ -195,66 +195,70 @@ class LDFMirror(object):
                
         start_time = time.time()
 
-        while len(todo)>0:
+        # re-use one connection for the thousands of lookups and inserts below
 
-            resource, path = todo.pop()
+        with self.store.session():
 
-            logging.info ('LDF: %8.1fs %5d %s %s' % (time.time() - start_time, len(todo), resource, repr(path)))
+            while len(todo)>0:
 
-            todo_new = set()
+                resource, path = todo.pop()
 
-            # try to fetch from our triple store
-            quads = self.store.filter_quads(s=resource, context=self.context.identifier)
+                logging.info ('LDF: %8.1fs %5d %s %s' % (time.time() - start_time, len(todo), resource, repr(path)))
 
-            do_add = False
-            if len(quads) == 0:
+                todo_new = set()
 
-                quads = self._fetch_ldf (s=resource)
-                do_add = True
+                # try to fetch from our triple store
+                quads = self.store.filter_quads(s=resource, context=self.context.identifier)
 
-            # transformations
+                do_add = False
+                if len(quads) == 0:
 
-            if len(path)>0:
-                res_filter = path[0]
+                    quads = self._fetch_ldf (s=resource)
+                    do_add = True
 
-                if type(res_filter) is tuple:
-                    pred, f = res_filter
+                # transformations
 
-                    for s,p,o,c in quads:
-                        if unicode(p) != pred:
-                            continue
+                if len(path)>0:
+                    res_filter = path[0]
+
+                    if type(res_filter) is tuple:
+                        pred, f = res_filter
 
-                        np, no = f(o)
+                        for s,p,o,c in quads:
+                            if unicode(p) != pred:
+                                continue
 
-                        np = self.store.resolve_shortcuts(np)
+                            np, no = f(o)
 
-                        if do_add:
-                            quads.append ((s, np, no, c))
+                            np = self.store.resolve_shortcuts(np)
 
-                        res_filter = unicode(np)
+                            if do_add:
+                                quads.append ((s, np, no, c))
 
-            if do_add:
-                self.store.addN(quads)
+                            res_filter = unicode(np)
 
-            if len(path)>0:
+                if do_add:
+                    self.store.addN(quads)
 
-                new_path   = path[1:]
+                if len(path)>0:
 
-                for s,p,o,c in quads:
+                    new_path   = path[1:]
 
-                    if not isinstance(o, rdflib.URIRef):
-                        continue
+                    for s,p,o,c in quads:
+
+                        if not isinstance(o, rdflib.URIRef):
+                            continue
 
-                    # logging.debug ('LDF   checking %s %s' % (p, o))
+                        # logging.debug ('LDF   checking %s %s' % (p, o))
 
-                    if res_filter == '*' or res_filter == unicode(p):
+                        if res_filter == '*' or res_filter == unicode(p):
 
-                        # import pdb; pdb.set_trace()
+                            # import pdb; pdb.set_trace()
 
-                        task = (o, new_path)
+                            task = (o, new_path)
 
-                        # logging.debug ('LDF   adding new task: %s' % repr(task))
-                        todo.append(task)
+                            # logging.debug ('LDF   adding new task: %s' % repr(task))
+                            todo.append(task)
 
 
 
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# Copyright 2017 Guenter Bartsch, Heiko Schaefer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+#
+# small thread safe LRU cache with hit/miss statistics
+#
+
+import threading
+
+from collections import OrderedDict
+
+class LRUCache(object):
+    """
+    LRU cache bounded by number of entries and, optionally, by the total
+    size of its entries (as reported by the caller on put()).
+    """
+
+    def __init__(self, max_size, max_bytes=None):
+        """
+        max_size  -- max number of entries, 0 disables the cache
+        max_bytes -- max total size of all entries, None for no limit
+        """
+
+        self.max_size  = max_size
+        self.max_bytes = max_bytes
+
+        self.entries   = OrderedDict()
+        self.bytes     = 0
+
+        self.hits      = 0
+        self.misses    = 0
+        self.evictions = 0
+
+        self.lock      = threading.Lock()
+
+    def get(self, key, default=None):
+
+        with self.lock:
+
+            try:
+                entry = self.entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+
+            # re-insert to mark as most recently used
+            self.entries[key] = entry
+            self.hits += 1
+
+            return entry[0]
+
+    def put(self, key, value, size=0):
+
+        if self.max_size <= 0:
+            return
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        with self.lock:
+
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+
+            self.entries[key] = (value, size)
+            self.bytes += size
+
+            while len(self.entries) > self.max_size or \
+                  (self.max_bytes is not None and self.bytes > self.max_bytes):
+                k, entry = self.entries.popitem(last=False)
+                self.bytes     -= entry[1]
+                self.evictions += 1
+
+    def remove(self, key):
+
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry[1]
+
+    def clear(self):
+
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def stats(self):
+        """dict of size, bytes, hits, misses, evictions and hit_rate"""
+
+        with self.lock:
+
+            lookups = self.hits + self.misses
+
+            return { 'size'      : len(self.entries),
+                     'bytes'     : self.bytes,
+                     'hits'      : self.hits,
+                     'misses'    : self.misses,
+                     'evictions' : self.evictions,
+                     'hit_rate'  : float(self.hits) / lookups if lookups else 0.0 }
+
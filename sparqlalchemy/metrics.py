@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# Copyright 2017 Guenter Bartsch, Heiko Schaefer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+#
+# store instrumentation: per operation stage timings and counters
+#
+
+import math
+import threading
+
+class Instrumentation(object):
+    """
+    receives measurements from a SPARQLAlchemyStore, this base class discards them.
+
+    Subclass and pass an instance to the store (instrumentation=...) to feed your
+    own metrics system. op is one of 'query', 'addN', 'filter_quads', 'remove',
+    see SPARQLAlchemyStore for the stages and counters reported per op.
+
+    Calls may come from several threads at once.
+
+    count_bytes -- whether to report 'bytes' counters of queries. Off by default,
+                   counting them walks every value fetched.
+    """
+
+    count_bytes = False
+
+    def timing(self, op, stage, seconds):
+        """stage of op took seconds"""
+        pass
+
+    def count(self, op, name, value):
+        """op processed value items of some kind, e.g. rows or bytes"""
+        pass
+
+class Histogram(object):
+    """
+    log scale histogram: bucket i counts values in (unit * 2**(i-1), unit * 2**i],
+    bucket 0 everything up to unit. Not thread safe on its own.
+    """
+
+    def __init__(self, unit=1.0):
+
+        self.unit    = unit
+        self.buckets = {}
+
+        self.count   = 0
+        self.sum     = 0.0
+        self.min     = None
+        self.max     = None
+
+    def add(self, value):
+
+        if value <= self.unit:
+            i = 0
+        else:
+            i = int(math.ceil(math.log(float(value) / self.unit, 2)))
+
+        self.buckets[i] = self.buckets.get(i, 0) + 1
+
+        self.count += 1
+        self.sum   += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        """upper bound of the bucket holding the q-th percentile (0 < q <= 100), capped at max"""
+
+        if not self.count:
+            return None
+
+        rank = q * self.count / 100.0
+
+        cnt = 0
+        for i in sorted(self.buckets):
+            cnt += self.buckets[i]
+            if cnt >= rank:
+                return min(self.unit * 2 ** i, self.max)
+
+        return self.max
+
+    def snapshot(self):
+        """dict of count, sum, min, max, mean, p50, p90 and p99"""
+
+        return { 'count' : self.count,
+                 'sum'   : self.sum,
+                 'min'   : self.min,
+                 'max'   : self.max,
+                 'mean'  : self.sum / self.count if self.count else None,
+                 'p50'   : self.percentile(50),
+                 'p90'   : self.percentile(90),
+                 'p99'   : self.percentile(99) }
+
+class HistogramCollector(Instrumentation):
+    """
+    default instrumentation: keeps an in-process histogram per op and stage / counter
+    """
+
+    TIMING_UNIT = 1e-6 # smallest timing bucket: 1us
+
+    def __init__(self, count_bytes=False):
+
+        self.count_bytes = count_bytes
+        self.timings = {}
+        self.counts  = {}
+        self.lock    = threading.Lock()
+
+    def timing(self, op, stage, seconds):
+
+        with self.lock:
+            h = self.timings.get((op, stage))
+            if h is None:
+                h = Histogram(self.TIMING_UNIT)
+                self.timings[(op, stage)] = h
+            h.add(seconds)
+
+    def count(self, op, name, value):
+
+        with self.lock:
+            h = self.counts.get((op, name))
+            if h is None:
+                h = Histogram()
+                self.counts[(op, name)] = h
+            h.add(value)
+
+    def stats(self):
+        """
+        dict mapping op to a dict mapping stage and counter names to histogram
+        snapshots (see Histogram.snapshot()), e.g.
+
+            stats()['query']['execute']['p90'] -- 90th percentile of SQL execution times
+            stats()['query']['rows']['sum']    -- total number of rows returned by queries
+        """
+
+        res = {}
+
+        with self.lock:
+            for d in (self.timings, self.counts):
+                for op, name in d:
+                    res.setdefault(op, {})[name] = d[(op, name)].snapshot()
+
+        return res
+
+    def reset(self):
+
+        with self.lock:
+            self.timings = {}
+            self.counts  = {}
+
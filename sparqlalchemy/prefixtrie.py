@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#
+# Copyright 2017 Guenter Bartsch, Heiko Schaefer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+#
+# character trie for longest prefix matches, e.g. namespace IRI -> prefix
+#
+
+class PrefixTrie(object):
+    """
+    maps string keys to values, finds the value of the longest key
+    a given string starts with in O(len(string))
+    """
+
+    _VALUE = None # dict key marking nodes that end a key (never a single character)
+
+    def __init__(self, d={}):
+
+        self.root = {}
+        self.size = 0
+
+        for k in d:
+            self.insert(k, d[k])
+
+    def insert(self, key, value):
+
+        node = self.root
+        for c in key:
+            node = node.setdefault(c, {})
+
+        if not self._VALUE in node:
+            self.size += 1
+
+        node[self._VALUE] = (key, value)
+
+    def longest_prefix(self, s):
+        """(key, value) for the longest key s starts with, None if there is none"""
+
+        res  = self.root.get(self._VALUE)
+        node = self.root
+
+        for c in s:
+            node = node.get(c)
+            if node is None:
+                break
+            if self._VALUE in node:
+                res = node[self._VALUE]
+
+        return res
+
+    def __len__(self):
+        return self.size
+
@@ -21,13 +21,24 @@
 # quick'n'dirty rdf triple store using rdflib and sqlalchemy
 #
 
+from __future__ import absolute_import
+
 import os
+import re
 import sys
+import gzip
 import traceback
 import codecs
 import logging
 import requests
 import StringIO
+import Queue
+import itertools
+import threading
+
+from contextlib         import contextmanager
+from collections        import OrderedDict
+from multiprocessing.pool import ThreadPool
 
 import dateutil.parser
 from time import time
@@ -37,11 +48,51 @@ from nltools import misc
 import rdflib
 from rdflib.plugins.sparql.parserutils import CompValue
 from rdflib.plugins.sparql             import parser, algebra
-
-from sqlalchemy import create_engine, sql, func
-from sqlalchemy import Table, Column, Integer, String, MetaData, ForeignKey, UnicodeText, Index
-
-ID_COLUMN_NAME = '__id__'
+from rdflib.plugins.parsers.ntriples   import NTriplesParser, ParseError
+from rdflib.plugins.parsers.nquads     import NQuadsParser
+from rdflib.namespace                  import XSD
+from rdflib.paths                      import Path, InvPath, SequencePath, AlternativePath, MulPath
+
+from sqlalchemy import create_engine, sql, func, inspect, event, exc
+from sqlalchemy import Table, Column, Integer, String, MetaData, ForeignKey, UnicodeText, Index, Float, Numeric
+from sqlalchemy.types import NullType
+from sqlalchemy.dialects import postgresql
+
+from sparqlalchemy.lrucache   import LRUCache
+from sparqlalchemy.metrics    import HistogramCollector
+from sparqlalchemy.prefixtrie import PrefixTrie
+
+ID_COLUMN_NAME    = '__id__'
+TERM_LOOKUP_CHUNK = 500     # max number of terms per IN (...) lookup, keeps us below SQLite's bind limit
+STREAM_BATCH_SIZE = 10000   # quads per flush in parse_stream()
+STREAM_FORMATS    = set(['nt', 'nt11', 'ntriples', 'nquads'])
+BULK_BATCH_SIZE   = 50000   # quads per COPY / executemany round trip in bulk_load()
+PLAN_CACHE_SIZE   = 256     # default number of compiled queries to keep
+BIND_PREFIX       = 'bind_' # bind parameter names for variables bound at execution time
+RESULT_CHUNK_SIZE = 1000    # rows per fetch in query_stream()
+TERM_CACHE_SIZE   = 100000  # default max number of rdflib terms to re-use when converting a result
+RESULT_FORMATS    = set(['rdflib', 'columns', 'tuples'])
+RESULT_VALUE_SIZE = 64      # estimated per value overhead of cached query results, in bytes
+ASYNC_WORKERS     = 4       # async API threads if the connection pool size is unknown
+ASYNC_PREFETCH    = 4       # chunks fetched ahead by aquery_stream()
+
+# rdflib's pyparsing based SPARQL parser is not thread safe
+_parser_lock = threading.Lock()
+
+# literal datatypes ordered by numeric value in ORDER BY
+NUMERIC_DATATYPES = [ unicode(XSD[dt]) for dt in ['integer', 'decimal', 'float', 'double', 'int', 'long', 'short', 'byte',
+                                                  'nonNegativeInteger', 'nonPositiveInteger', 'negativeInteger',
+                                                  'positiveInteger', 'unsignedLong', 'unsignedInt', 'unsignedShort',
+                                                  'unsignedByte'] ]
+INTEGER_DATATYPES = [ dt for dt in NUMERIC_DATATYPES if not dt in [unicode(XSD[t]) for t in ['decimal', 'float', 'double']] ]
+
+# string literals and IRIs (kept verbatim), comments and whitespace (collapsed) in SPARQL query texts
+QUERY_TOKEN_RE    = re.compile(r'("(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'|<[^<>"{}|^`\\\s]*>|#[^\n]*|\s+)')
+
+# absolute IRIs turned into variables by query_template(), unless they follow one of these keywords
+TEMPLATE_IRI_RE   = re.compile(r'^<[A-Za-z][A-Za-z0-9+.-]*:[^<>"{}|^`\\\s]*>$')
+TEMPLATE_KEEP     = set(['BASE', 'FROM', 'NAMED', 'GRAPH', 'SERVICE', '^^'])
+TEMPLATE_PREFIX   = '__const_'
 
 def format_algebra(f, q):
 
@@ -67,9 +118,256 @@ def format_algebra(f, q):
             pp(f, x)
 
 
+def normalize_query(q):
+    """normalize a SPARQL query text for use as a cache key: collapse whitespace and strip comments"""
+
+    # triple quoted strings may contain anything, don't risk it
+    if '"""' in q or "'''" in q:
+        return q
+
+    res = []
+    for tok in QUERY_TOKEN_RE.split(q):
+        if not tok:
+            continue
+        if tok.isspace() or tok.startswith('#'):
+            if res and res[-1] != ' ':
+                res.append(' ')
+        else:
+            res.append(tok)
+
+    return ''.join(res).strip()
+
+def query_template(q, keep=()):
+    """
+    split a SPARQL query text into a template and the constants it uses: absolute IRIs
+    (other than in PREFIX, BASE and FROM declarations and datatypes) are replaced by
+    variables ?__const_0, ?__const_1, ... one per distinct IRI.
+
+    keep -- IRIs to leave in place
+
+    returns (template, list of IRIs)
+    """
+
+    if '"""' in q or "'''" in q:
+        return q, []
+
+    res    = []
+    consts = []
+    idx    = {}
+    prev   = ['', ''] # last two tokens other than whitespace and comments
+
+    for tok in QUERY_TOKEN_RE.split(q):
+
+        if not tok:
+            continue
+
+        if tok.isspace() or tok.startswith('#'):
+            res.append(tok)
+            continue
+
+        if TEMPLATE_IRI_RE.match(tok) and not prev[1].upper() in TEMPLATE_KEEP \
+           and not prev[1].endswith('^^') and prev[0].upper() != 'PREFIX' and not tok[1:-1] in keep:
+
+            iri = tok[1:-1]
+            if not iri in idx:
+                idx[iri] = len(consts)
+                consts.append(iri)
+
+            res.append('?%s%d' % (TEMPLATE_PREFIX, idx[iri]))
+
+        else:
+            res.append(tok)
+
+        prev = [prev[1], tok]
+
+    return ''.join(res), consts
+
+def _ping_connection(dbapi_connection, connection_record, connection_proxy):
+    """
+    pool checkout listener making sure connections are alive before they are
+    handed out (see pool_pre_ping), the pool replaces dead ones
+    """
+
+    try:
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        finally:
+            cursor.close()
+    except Exception:
+        raise exc.DisconnectionError()
+
+class _QueryPlan(object):
+    """a translated and compiled query, ready for execution"""
+
+    def __init__(self, algebra, stmt, compiled, var_map, var_lang, var_dts, graphs=None):
+        self.algebra  = algebra
+        self.stmt     = stmt
+        self.compiled = compiled
+        self.var_map  = var_map
+        self.var_lang = var_lang
+        self.var_dts  = var_dts
+        self.graphs   = graphs # contexts the query is restricted to (FROM), None: all of them
+
+        # (variable, value, lang, datatype) result row indices per variable, lang/datatype may be None
+
+        keys = stmt.c.keys()
+
+        self.columns = []
+        for var_name in var_map:
+            self.columns.append((rdflib.term.Variable(var_name),
+                                 keys.index(var_name),
+                                 keys.index(var_lang[var_name].name) if var_name in var_lang else None,
+                                 keys.index(var_dts[var_name].name)  if var_name in var_dts  else None))
+
+class _StreamProducer(object):
+    """
+    state a StreamIterator shares with the background thread filling it. The thread
+    holds no reference to the iterator itself, so iterators dropped without close()
+    get garbage collected, which stops the thread (see StreamIterator.__del__()).
+    """
+
+    END = object()
+
+    def __init__(self, prefetch):
+
+        self.chunks    = Queue.Queue(prefetch)
+        self.cancelled = threading.Event()
+
+    def produce(self, rows_func, chunk_size):
+        """runs in the background thread: move rows to our queue, chunk_size rows at a time"""
+
+        rows_iter = None
+
+        try:
+            rows_iter = rows_func()
+            while not self.cancelled.is_set():
+                chunk = list(itertools.islice(rows_iter, chunk_size))
+                if not chunk:
+                    break
+                self.put(chunk)
+            self.put(self.END)
+        except Exception:
+            # exc_info keeps the traceback for the consumer
+            self.put(sys.exc_info())
+        finally:
+            if rows_iter is not None:
+                rows_iter.close()
+
+    def put(self, item):
+
+        while not self.cancelled.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return
+            except Queue.Full:
+                pass
+
+class StreamIterator(object):
+    """
+    iterator over rows of a query fetched by a background thread, see
+    SPARQLAlchemyStore.aquery_stream(). Call close() when done before the
+    end of the result is reached to release the thread and its connection
+    right away, otherwise that happens once the iterator is garbage collected.
+    """
+
+    def __init__(self, prefetch):
+
+        self.producer = _StreamProducer(prefetch)
+        self.rows     = iter([])
+        self.done     = False
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+
+        while True:
+
+            try:
+                return next(self.rows)
+            except StopIteration:
+                pass
+
+            if self.done:
+                raise StopIteration
+
+            chunk = self.producer.chunks.get()
+
+            if chunk is _StreamProducer.END:
+                self.done = True
+                raise StopIteration
+            if isinstance(chunk, tuple):
+                self.done = True
+                raise chunk[0], chunk[1], chunk[2]
+
+            self.rows = iter(chunk)
+
+    def close(self):
+
+        self.done = True
+        self.rows = iter([])
+        self.producer.cancelled.set()
+
+    def __del__(self):
+        self.producer.cancelled.set()
+
+class PreparedQuery(object):
+    """
+    a parsed and translated query, see SPARQLAlchemyStore.prepare()
+
+    keeps one compiled plan per set of variables bound on execution
+    """
+
+    def __init__(self, algebra):
+        self.algebra = algebra
+        self.plans   = {}
+
+class _ContextSink(object):
+    """
+    stands in for an rdflib graph: collects triples added to one context
+    as quads and provides the identifier addN() expects
+    """
+
+    def __init__(self, quads, identifier):
+        self.quads      = quads
+        self.identifier = identifier
+
+    def add(self, triple):
+        s, p, o = triple
+        self.quads.append((s, p, o, self))
+
+class _QuadSink(object):
+    """
+    sink for rdflib's line based N-Triples and N-Quads parsers,
+    collects parsed statements in a list of quads
+    """
+
+    def __init__(self, identifier):
+        self.identifier = rdflib.URIRef(identifier)
+        self.quads      = []
+        self.contexts   = {}
+
+    def get_context(self, identifier):
+        if not identifier in self.contexts:
+            self.contexts[identifier] = _ContextSink(self.quads, identifier)
+        return self.contexts[identifier]
+
+    def triple(self, s, p, o):
+        self.get_context(self.identifier).add((s, p, o))
+
+    def flush(self):
+        quads = self.quads
+        self.quads    = []
+        self.contexts = {}
+        return quads
+
 class SPARQLAlchemyStore(object):
 
-    def __init__(self, db_url, tablename, echo=False, aliases={}, prefixes={}):
+    def __init__(self, db_url, tablename, echo=False, aliases={}, prefixes={}, dict_encoding=False,
+                 pool_size=None, max_overflow=None, pool_pre_ping=None, pool_recycle=None,
+                 plan_cache_size=PLAN_CACHE_SIZE, max_path_depth=None, term_cache_size=TERM_CACHE_SIZE,
+                 instrumentation=None, result_cache_size=0, result_cache_bytes=None, async_workers=None):
 
         """
         aliases   -- dict mapping resource aliases to IRIs, e.g.
@@ -83,34 +381,279 @@ class SPARQLAlchemyStore(object):
                           'dbr' : 'http://dbpedia.org/resource/',
                           'dbp' : 'http://dbpedia.org/property/',
                      }
+        dict_encoding -- if True, terms (IRIs and literal values) are stored once in a separate
+                     dictionary table (<tablename>_terms) and the quads table holds integer
+                     term ids only. Keeps indexes small and turns joins into integer
+                     comparisons. Cannot be switched for an existing table.
+        pool_size, max_overflow, pool_recycle
+                  -- connection pool settings passed on to sqlalchemy's create_engine()
+                     (only if set, not every pool class supports all of them)
+        pool_pre_ping -- if True, test connections with a SELECT 1 whenever they are taken
+                     from the pool and replace dead ones (e.g. after a database restart)
+        plan_cache_size -- number of parsed and compiled queries to keep in an LRU cache,
+                     0 disables plan caching. See plan_cache.stats() for hit/miss counters.
+        max_path_depth -- optional bound on the number of steps evaluated for * and + property
+                     paths. Paths are evaluated using recursive common table expressions
+                     (SQLite >= 3.8.3, PostgreSQL, MySQL >= 8), cycles are detected either way.
+        term_cache_size -- max number of rdflib terms re-used when converting the rows of
+                     one query result, 0 disables re-use.
+        instrumentation -- receives per operation timings and counters, see metrics.Instrumentation.
+                     Defaults to an in-process metrics.HistogramCollector, query its stats()
+                     through self.instrumentation. Reported are
+                     query:        parse, translate, compile (plan cache misses only), execute,
+                                   first_row, fetch, decode timings; rows, bytes counters
+                     addN:         encode, write timings; quads counter
+                     filter_quads: execute, decode timings; rows counter
+                     remove:       execute timing; rows counter
+                     construct_into: execute timing; quads counter
+                     bytes is the total length of the string values fetched, reported
+                     only if the instrumentation asks for it (count_bytes).
+        result_cache_size, result_cache_bytes
+                  -- max number and (estimated) total size of query() results kept in an
+                     LRU cache, disabled by default. Entries are tied to the version of the
+                     graphs a query reads (all of them unless restricted by FROM clauses),
+                     which is bumped by every change to a graph, so only results of queries
+                     reading a changed graph are invalidated. Cached results are shared
+                     between callers and must not be modified. See result_cache.stats().
+        async_workers -- number of threads running aquery() and friends, defaults to the
+                     size of the engine's connection pool
+
+        Triple patterns are joined most-selective-first based on per-predicate statistics
+        kept in <tablename>_stats, call update_stats() after large changes to the store.
         """
 
-        self.db_url   = db_url
-        self.aliases  = aliases
-        self.prefixes = prefixes
-        self.metadata = MetaData()
+        self.db_url        = db_url
+        self.aliases       = aliases
+        self.prefixes      = prefixes
+        self.dict_encoding = dict_encoding
+        self.metadata      = MetaData()
+        self.plan_cache    = LRUCache(plan_cache_size)
+        self.term_cache_size = term_cache_size
+        self.result_cache  = LRUCache(result_cache_size, result_cache_bytes)
+        self.instrumentation = instrumentation if instrumentation is not None else HistogramCollector()
+        self.max_path_depth = max_path_depth
+        self._ns_version   = 0  # bumped whenever prefixes or aliases change, part of plan cache keys
+        self._compact_ns   = None # (ns version, namespace trie, inverse aliases), see compact_iri()
+
+        # data versions, part of result cache keys: _version is bumped on every change,
+        # _graph_versions per context, _epoch on changes to unknown or all contexts
+
+        self._version        = 0
+        self._graph_versions = {}
+        self._epoch          = 0
+        self._version_lock   = threading.Lock()
+
+        if dict_encoding:
+
+            self.terms = Table(tablename + '_terms', self.metadata,
+                Column('id',       Integer, primary_key=True),
+                Column('value',    UnicodeText),
+            )
+
+            Index('idx_%s_terms_value' % tablename, self.terms.c.value, unique=True)
+
+            term_type = Integer
+
+        else:
+            self.terms = None
+            term_type  = UnicodeText
 
         self.quads = Table(tablename, self.metadata,
             Column('id',       Integer, primary_key=True),
-            Column('s',        UnicodeText, index=True),
-            Column('p',        UnicodeText, index=True),
-            Column('o',        UnicodeText, index=True),
-            Column('context',  UnicodeText, index=True),
+            Column('s',        term_type, index=True),
+            Column('p',        term_type, index=True),
+            Column('o',        term_type, index=True),
+            Column('context',  term_type, index=True),
             Column('lang',     String,      index=True),
             Column('datatype', String),
         )
 
         Index('idx_%s_spo' % tablename, self.quads.c.s, self.quads.c.p, self.quads.c.o)
+        Index('uq_%s_quad' % tablename, self.quads.c.s, self.quads.c.p, self.quads.c.o, self.quads.c.context,
+                                         self.quads.c.lang, self.quads.c.datatype, unique=True)
+
+        # per-predicate cardinalities used to order triple patterns, see update_stats()
+
+        self.stats = Table(tablename + '_stats', self.metadata,
+            Column('id',         Integer, primary_key=True),
+            Column('p',          term_type, index=True),
+            Column('cnt',        Integer),
+            Column('distinct_s', Integer),
+            Column('distinct_o', Integer),
+        )
+        self._stats = None
+
+        engine_args = {}
+        if pool_size is not None:
+            engine_args['pool_size']     = pool_size
+        if max_overflow is not None:
+            engine_args['max_overflow']  = max_overflow
+        if pool_recycle is not None:
+            engine_args['pool_recycle']  = pool_recycle
+
+        self.engine = create_engine(db_url, echo=echo, **engine_args)
+
+        # create_engine(pool_pre_ping=...) needs sqlalchemy >= 1.2, ping on checkout ourselves
+        if pool_pre_ping:
+            event.listen(self.engine, 'checkout', _ping_connection)
 
-        self.engine = create_engine(db_url, echo=echo)
+        # per-thread connection pinned by session() / transaction()
+        self._local = threading.local()
+
+        # thread pool for the async API, created on first use
+        self.async_workers = async_workers
+        self._async_pool   = None
+        self._async_lock   = threading.Lock()
 
         self.metadata.create_all(self.engine)
 
+        # tables created by older versions lack the unique index our upsert path relies on.
+        # since NULLs never collide in unique indexes, lang and datatype are stored as empty
+        # strings instead of NULL in tables that have it
+
+        self.unique_quads = False
+        for idx in inspect(self.engine).get_indexes(tablename):
+            if idx['unique'] and set(idx['column_names']) == set(['s', 'p', 'o', 'context', 'lang', 'datatype']):
+                self.unique_quads = True
+                break
+
+    #
+    # connection handling
+    #
+
+    @contextmanager
+    def session(self):
+        """
+        pin one connection to all store operations of the current thread, e.g.
+
+            with store.session():
+                quads = store.filter_quads(...)
+                store.addN(...)
+
+        statements are still committed individually, see transaction() for that.
+        Nested session()/transaction() blocks re-use the outer connection.
+        """
+
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+
+        conn = self.engine.connect()
+        self._local.conn = conn
+
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """
+        like session(), but run all store operations of the block inside a single
+        transaction which is committed at the end of the block or rolled back on
+        exceptions. Nested blocks join the outer transaction.
+        """
+
+        with self.session() as conn:
+
+            if conn.in_transaction():
+                yield conn
+                return
+
+            # changes become visible to other connections on commit only, so bump data
+            # versions (again) at the end of the transaction, see _touch()
+
+            trans = conn.begin()
+            self._local.touched = []
+            try:
+                yield conn
+                trans.commit()
+            except:
+                trans.rollback()
+                raise
+            finally:
+                touched = self._local.touched
+                self._local.touched = None
+                for contexts in touched:
+                    self._touch(contexts)
+
+    def _touch(self, contexts):
+        """
+        bump data versions after changing contexts (a collection of context IRIs or None
+        for unknown / all contexts), invalidating cached results of queries reading them
+        """
+
+        touched = getattr(self._local, 'touched', None)
+        if touched is not None:
+            touched.append(contexts)
+
+        with self._version_lock:
+
+            self._version += 1
+
+            if contexts is None:
+                self._epoch += 1
+            else:
+                for context in contexts:
+                    self._graph_versions[context] = self._graph_versions.get(context, 0) + 1
+
+    def _data_version(self, graphs):
+        """current version of the data in graphs (None: all graphs)"""
+
+        with self._version_lock:
+
+            if graphs is None:
+                return self._version
+
+            return (self._epoch, tuple([ self._graph_versions.get(g, 0) for g in graphs ]))
+
+    def _timing(self, op, stage, start_time):
+        """report time passed since start_time as stage of op, returns the current time"""
+
+        now = time()
+        self.instrumentation.timing(op, stage, now - start_time)
+        return now
+
+    def _count_rows(self, op, rows):
+        """report number of rows and (if asked for, see Instrumentation.count_bytes) bytes fetched by op"""
+
+        self.instrumentation.count(op, 'rows', len(rows))
+
+        if not self.instrumentation.count_bytes:
+            return
+
+        nbytes = 0
+        for row in rows:
+            for v in row:
+                if isinstance(v, basestring):
+                    nbytes += len(v)
+
+        self.instrumentation.count(op, 'bytes', nbytes)
+
+    @contextmanager
+    def _connection(self):
+        """connection pinned by session()/transaction() or a fresh one which is closed afterwards"""
+
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+
+        conn = self.engine.connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
     def register_prefix (self, prefix, uri):
         self.prefixes[prefix] = uri
+        self._ns_version += 1
 
     def register_alias (self, alias, uri):
         self.aliases[alias] = uri
+        self._ns_version += 1
 
     def resolve_shortcuts (self, resource):
 
@@ -125,17 +668,117 @@ class SPARQLAlchemyStore(object):
             return self.aliases[resource]
 
         #
-        # apply prefixes
+        # apply prefixes: prefix names cannot contain colons, so a single dict lookup will do
         #
 
-        for pfx in self.prefixes:
-            prefix = pfx + ':'
-            if resource.startswith(prefix):
-                resource = self.prefixes[pfx] + resource[len(prefix):]
-                break
+        pfx, colon, local = resource.partition(':')
+        if colon and pfx in self.prefixes:
+            resource = self.prefixes[pfx] + local
 
         return resource
 
+    def compact_iri (self, iri):
+        """
+        inverse of resolve_shortcuts(): turn iri into an alias or prefixed name using the
+        aliases and (longest matching) prefixes registered with this store, e.g.
+
+            http://dbpedia.org/resource/Helmut_Kohl -> dbr:Helmut_Kohl
+
+        returns iri unchanged if neither applies
+        """
+
+        compact_ns = self._compact_ns
+        if compact_ns is None or compact_ns[0] != self._ns_version:
+
+            aliases = {}
+            for alias in self.aliases:
+                aliases[self.aliases[alias]] = alias
+
+            ns = {}
+            for pfx in self.prefixes:
+                ns[self.prefixes[pfx]] = pfx
+
+            compact_ns = (self._ns_version, PrefixTrie(ns), aliases)
+            self._compact_ns = compact_ns
+
+        version, trie, aliases = compact_ns
+
+        res = aliases.get(iri)
+        if res is not None:
+            return res
+
+        m = trie.longest_prefix(iri)
+        if m is None:
+            return iri
+
+        return m[1] + u':' + iri[len(m[0]):]
+
+    #
+    # term dictionary support
+    #
+
+    def _term_const(self, value):
+        """SQL expression matching a constant term as it is stored in the quads table"""
+
+        if not self.dict_encoding:
+            return value
+
+        return sql.select([self.terms.c.id]).where(self.terms.c.value == value).as_scalar()
+
+    def _term_value(self, col):
+        """SQL expression yielding the term value for a quads table column (or a column derived from one)"""
+
+        if not self.dict_encoding:
+            return col
+
+        return sql.select([self.terms.c.value]).where(self.terms.c.id == col).as_scalar()
+
+    def _encode_terms(self, conn, values):
+        """map term values to their dictionary ids, creating missing entries on the fly"""
+
+        ids = {}
+
+        todo = list(set(values))
+
+        for i in range(0, len(todo), TERM_LOOKUP_CHUNK):
+            chunk = todo[i:i+TERM_LOOKUP_CHUNK]
+            for row in conn.execute(sql.select([self.terms.c.id, self.terms.c.value])
+                                       .where(self.terms.c.value.in_(chunk))):
+                ids[row[1]] = row[0]
+
+        missing = [v for v in todo if not v in ids]
+        if missing:
+
+            # tolerate concurrent writers adding the same terms
+
+            stmt = self._insert_ignore(self.terms)
+            if stmt is None:
+                stmt = self.terms.insert()
+
+            conn.execute(stmt, [ {'value': v} for v in missing ])
+
+            for i in range(0, len(missing), TERM_LOOKUP_CHUNK):
+                chunk = missing[i:i+TERM_LOOKUP_CHUNK]
+                for row in conn.execute(sql.select([self.terms.c.id, self.terms.c.value])
+                                           .where(self.terms.c.value.in_(chunk))):
+                    ids[row[1]] = row[0]
+
+        return ids
+
+    def _insert_ignore(self, table):
+        """INSERT statement silently skipping rows that violate a unique index, None if the dialect has no such thing"""
+
+        dialect = self.engine.dialect.name
+
+        if dialect == 'postgresql':
+            return postgresql.insert(table).on_conflict_do_nothing()
+        if dialect == 'sqlite':
+            return table.insert().prefix_with('OR IGNORE')
+        if dialect == 'mysql':
+            return table.insert().prefix_with('IGNORE')
+
+        return None
+
     def remove(self, quad):
         """Remove quad(s) from the store."""
         s, p, o, context = quad
@@ -143,21 +786,25 @@ class SPARQLAlchemyStore(object):
         stmt = self.quads.delete()
 
         if s:
-            stmt = stmt.where(self.quads.c.s == unicode(s))
+            stmt = stmt.where(self.quads.c.s == self._term_const(unicode(s)))
         if p:
-            stmt = stmt.where(self.quads.c.p == unicode(p))
+            stmt = stmt.where(self.quads.c.p == self._term_const(unicode(p)))
         if o:
-            stmt = stmt.where(self.quads.c.o == unicode(o))
+            stmt = stmt.where(self.quads.c.o == self._term_const(unicode(o)))
         if context:
-            stmt = stmt.where(self.quads.c.context == unicode(context))
+            stmt = stmt.where(self.quads.c.context == self._term_const(unicode(context)))
 
         # logging.debug ('remove stmt: %s' % stmt)
 
-        conn = self.engine.connect()
+        start_time = time()
 
-        conn.execute(stmt)
+        with self._connection() as conn:
+            result = conn.execute(stmt)
 
-        conn.close()
+        self._touch([unicode(context)] if context else None)
+
+        self._timing('remove', 'execute', start_time)
+        self.instrumentation.count('remove', 'rows', result.rowcount)
 
 
     # def add(self, triple, context=None):
@@ -171,24 +818,22 @@ class SPARQLAlchemyStore(object):
 
         logging.debug('clear_graph(%s)' % ('all' if context is None else context))
 
-        conn = self.engine.connect()
-
         stmt = self.quads.delete()
         if not context is None:
-            stmt = stmt.where(self.quads.c.context == context)
+            stmt = stmt.where(self.quads.c.context == self._term_const(context))
 
-        conn.execute(stmt)
+        with self._connection() as conn:
+            conn.execute(stmt)
 
-        conn.close()
+        self._touch(None if context is None else [unicode(context)])
 
     def clear_all_graphs(self):
         self.clear_graph(None)
 
     def __len__(self):
         stmt = sql.select([func.count(self.quads.c.id)]).as_scalar()
-        conn = self.engine.connect()
-        res = conn.execute(sql.select([stmt])).fetchall()
-        conn.close()
+        with self._connection() as conn:
+            res = conn.execute(sql.select([stmt])).fetchall()
 
         logging.debug('__len__: %s' % repr(res))
 
@@ -197,10 +842,16 @@ class SPARQLAlchemyStore(object):
 
     def addN(self, quads):
 
-        # logging.debug('addN(quads)')
+        with self._connection() as conn:
+            self._addN(conn, quads)
+
+    def _quad_values(self, conn, quads, contexts=None):
+        """
+        convert quads to a list of bind parameter dicts ready for insertion into our quads table,
+        adds the context IRIs encountered to contexts if given
+        """
 
         values = []
-        cnt    = 0
         for s, p, o, context in quads:
 
             if isinstance(o, rdflib.Literal):
@@ -213,81 +864,110 @@ class SPARQLAlchemyStore(object):
                 ot = None
                 ol = None
 
-            values.append({'b_s'       : s, 
-                           'b_p'       : p, 
+            if self.unique_quads:
+                ol = ol or u''
+                ot = ot or u''
+
+            values.append({'b_s'       : unicode(s), 
+                           'b_p'       : unicode(p), 
                            'b_o'       : ov, 
                            'b_context' : unicode(context.identifier),
                            'b_lang'    : ol,
                            'b_datatype': ot })
-            cnt += 1
             # logging.debug('quad: %s' % repr(( s,p,o,context, ov, ot, ol)))
 
-        # logging.debug('addN: %d quads to add.' % cnt)
-        if cnt==0:
+        if contexts is not None:
+            for v in values:
+                contexts.add(v['b_context'])
+
+        if self.dict_encoding and values:
+
+            term_values = []
+            for v in values:
+                term_values.extend([v['b_s'], v['b_p'], v['b_o'], v['b_context']])
+
+            ids = self._encode_terms(conn, term_values)
+
+            for v in values:
+                v['b_s']       = ids[v['b_s']]
+                v['b_p']       = ids[v['b_p']]
+                v['b_o']       = ids[v['b_o']]
+                v['b_context'] = ids[v['b_context']]
+
+        return values
+
+    def _addN(self, conn, quads):
+
+        # logging.debug('addN(quads)')
+
+        start_time = time()
+
+        contexts = set()
+        values   = self._quad_values(conn, quads, contexts)
+
+        start_time = self._timing('addN', 'encode', start_time)
+        self.instrumentation.count('addN', 'quads', len(values))
+
+        # logging.debug('addN: %d quads to add.' % len(values))
+        if not values:
             # logging.debug ('  -> nothing to do.')
             return
 
-        conn = self.engine.connect()
+        # upsert where supported: the unique index on (s, p, o, context, lang, datatype)
+        # keeps duplicate edges out of our graph, existing quads are simply skipped
 
-        # first delete existing quads so we have no duplicate edges in our graph
+        stmt = self._insert_ignore(self.quads) if self.unique_quads else None
 
-        # logging.debug('addN: delete old quads...')
-    
-        stmt = self.quads.delete()\
-                         .where(self.quads.c.s == sql.bindparam('b_s'))\
-                         .where(self.quads.c.p == sql.bindparam('b_p'))\
-                         .where(self.quads.c.o == sql.bindparam('b_o'))\
-                         .where(self.quads.c.context == sql.bindparam('b_context'))
+        if stmt is None:
 
-        conn.execute(stmt, values)
+            # fallback: first delete existing quads so we have no duplicate edges in our graph
+
+            # logging.debug('addN: delete old quads...')
+        
+            dstmt = self.quads.delete()\
+                              .where(self.quads.c.s == sql.bindparam('b_s'))\
+                              .where(self.quads.c.p == sql.bindparam('b_p'))\
+                              .where(self.quads.c.o == sql.bindparam('b_o'))\
+                              .where(self.quads.c.context == sql.bindparam('b_context'))
+
+            conn.execute(dstmt, values)
+
+            stmt = self.quads.insert()
 
         # now, insert quads
 
         # logging.debug('addN: insert new quads...')
 
-        stmt = self.quads.insert().values(\
-                         s        = sql.bindparam('b_s'), \
-                         p        = sql.bindparam('b_p'), \
-                         o        = sql.bindparam('b_o'), \
-                         context  = sql.bindparam('b_context'),
-                         lang     = sql.bindparam('b_lang'),
-                         datatype = sql.bindparam('b_datatype'))
+        stmt = stmt.values(s        = sql.bindparam('b_s'), \
+                           p        = sql.bindparam('b_p'), \
+                           o        = sql.bindparam('b_o'), \
+                           context  = sql.bindparam('b_context'),
+                           lang     = sql.bindparam('b_lang'),
+                           datatype = sql.bindparam('b_datatype'))
 
         conn.execute(stmt, values)
 
-        conn.close()
+        self._touch(contexts)
 
-        # logging.debug('addN: done.')
+        self._timing('addN', 'write', start_time)
 
-        # alternative implementation: "upsert" (not supported by all sqlalchemy DB backends yet
-
-        # update_cte = (
-        #     triples.update()
-        #     .where(triples.c.s == sql.bindparam('b_s'))
-        #     .where(triples.c.p == sql.bindparam('b_p'))
-        #     .where(triples.c.o == sql.bindparam('b_o'))
-        #     .values(s = sql.bindparam('b_s'))
-        #     .returning(sql.literal(1))
-        #     .cte('update_cte')
-        # )
-
-        # stmt = triples.insert().from_select([ triples.c.s,
-        #                                       triples.c.p,
-        #                                       triples.c.o,
-        #                                     ],
-        #                                     sql.select([sql.bindparam('b_s'),
-        #                                                 sql.bindparam('b_p'),
-        #                                                 sql.bindparam('b_o')
-        #                                                 ])
-        #                                     .where(~sql.exists(update_cte.select()))
-        #                                 )
-        # conn = engine.connect()
-        # conn.execute(stmt, values)
-        # conn.close()
+        # logging.debug('addN: done.')
 
     def parse(self, source=None, publicID=None, format="xml",
               location=None, file=None, data=None, context=u'http://example.com', **args):
 
+        # line based formats can be streamed into the DB without building a graph in memory
+
+        if format in STREAM_FORMATS:
+            if data is not None:
+                if isinstance(data, unicode):
+                    data = data.encode('utf8')
+                return self.parse_stream(StringIO.StringIO(data), format=format, context=context)
+            if file is not None:
+                return self.parse_stream(file, format=format, context=context)
+            if location is not None and os.path.exists(location):
+                return self.parse_stream(location, format=format, context=context)
+
         # parse to memory first, then do a bulk insert into our DB
 
         logging.debug('parsing to memory...')
@@ -311,554 +991,2479 @@ class SPARQLAlchemyStore(object):
         logging.debug('addN ...')
         self.addN(quads)
 
+    def _stream_batches(self, source, format, context, batch_size):
+        """generator parsing a line based RDF document, yields lists of at most batch_size quads"""
 
-    def _check_keys(self, d, keys):
-        """ensure dict d has only the given keys"""
-        for k in d:
-            if not (k in keys):
-                raise Exception ('unexpected key found: %s' % k)
+        if not format in STREAM_FORMATS:
+            raise Exception ('line based format expected, got %s' % format)
 
-    #
-    # convert an expression to sqlalchemy operators
-    #
+        if isinstance(source, basestring):
+            f = gzip.open(source, 'rb') if source.endswith('.gz') else open(source, 'rb')
+        else:
+            f = source
 
-    def _expr2alchemy(self, node, var_map, var_lang, var_dts):
+        sink = _QuadSink(context)
 
-        res = None
+        if format == 'nquads':
+            p = NQuadsParser()
+            p.sink = sink
+        else:
+            p = NTriplesParser(sink)
 
-        if isinstance(node, rdflib.term.Literal):
+        p.file   = codecs.getreader('utf-8')(f)
+        p.buffer = ''
 
-            if node.value is None:
-                res = None
-            else:
-                res = unicode(node)
+        try:
 
-        elif isinstance(node, rdflib.term.Variable):
+            while True:
 
-            res = var_map[unicode(node)]
+                p.line = line = p.readline()
+                if line is None:
+                    break
 
-        elif isinstance (node, rdflib.term.URIRef):
+                try:
+                    p.parseline()
+                except ParseError as e:
+                    raise ParseError('Invalid line (%s): %r' % (e, line))
 
-            res = unicode(node)
+                if len(sink.quads) >= batch_size:
+                    yield sink.flush()
 
-        elif node.name == 'RelationalExpression':
+            quads = sink.flush()
+            if quads:
+                yield quads
 
-            self._check_keys(node, set(['expr', 'op', 'other', '_vars']))
+        finally:
+            if f is not source:
+                f.close()
 
-            if node['op'] == '=':
+    def parse_stream(self, source, format='nt', context=u'http://example.com', batch_size=STREAM_BATCH_SIZE, bulk=False):
+        """
+        stream a line based RDF document (N-Triples or N-Quads) into the store.
 
-                o1 = self._expr2alchemy(node['expr'], var_map, var_lang, var_dts)
-                o2 = self._expr2alchemy(node['other'], var_map, var_lang, var_dts)
+        Statements are parsed line by line and written in batches of batch_size
+        quads, so memory use is bounded by the batch size, not by the document.
+        The whole document is loaded in a single transaction.
 
-                res = o1 == o2
+        source     -- file name (gzip compressed if it ends in .gz) or file-like object
+        format     -- 'nt' or 'nquads'
+        context    -- graph context for triples (and quads without a graph label)
+        bulk       -- load through bulk_load() (initial loads only, see there)
 
-            elif node['op'] == '!=':
+        returns the number of quads read
+        """
 
-                o1 = self._expr2alchemy(node['expr'], var_map, var_lang, var_dts)
-                o2 = self._expr2alchemy(node['other'], var_map, var_lang, var_dts)
+        if bulk:
+            return self.bulk_load(itertools.chain.from_iterable(self._stream_batches(source, format, context, batch_size)))
 
-                res = o1 != o2
+        with self.transaction() as conn:
 
-            elif node['op'] == '>=':
+            cnt        = 0
+            start_time = time()
 
-                o1 = self._expr2alchemy(node['expr'], var_map, var_lang, var_dts)
-                o2 = self._expr2alchemy(node['other'], var_map, var_lang, var_dts)
+            for quads in self._stream_batches(source, format, context, batch_size):
 
-                res = o1 >= o2
+                self._addN(conn, quads)
+                cnt += len(quads)
 
-            elif node['op'] == '<=':
+                elapsed = time() - start_time
+                logging.info('parse_stream: %9d quads, %8.1fs, %8.0f quads/s' % (cnt, elapsed, cnt / elapsed if elapsed > 0 else 0.0))
 
-                o1 = self._expr2alchemy(node['expr'], var_map, var_lang, var_dts)
-                o2 = self._expr2alchemy(node['other'], var_map, var_lang, var_dts)
+        elapsed = time() - start_time
+        logging.info('parse_stream: done, %d quads in %.1fs (%.0f quads/s)' % (cnt, elapsed, cnt / elapsed if elapsed > 0 else 0.0))
 
-                res = o1 <= o2
+        return cnt
 
-            elif node['op'] == '>':
+    #
+    # bulk loading
+    #
 
-                o1 = self._expr2alchemy(node['expr'], var_map, var_lang, var_dts)
-                o2 = self._expr2alchemy(node['other'], var_map, var_lang, var_dts)
+    def _copy_rows(self, conn, values):
+        """PostgreSQL: load rows via COPY FROM STDIN (text format)"""
 
-                res = o1 > o2
+        def esc(v):
+            if v is None:
+                return u'\\N'
+            return unicode(v).replace(u'\\', u'\\\\').replace(u'\t', u'\\t').replace(u'\n', u'\\n').replace(u'\r', u'\\r')
 
-            elif node['op'] == '<':
+        buf = StringIO.StringIO()
+        for v in values:
+            buf.write(u'\t'.join([esc(v['b_s']), esc(v['b_p']), esc(v['b_o']), esc(v['b_context']),
+                                  esc(v['b_lang']), esc(v['b_datatype'])]).encode('utf8'))
+            buf.write('\n')
+        buf.seek(0)
 
-                o1 = self._expr2alchemy(node['expr'], var_map, var_lang, var_dts)
-                o2 = self._expr2alchemy(node['other'], var_map, var_lang, var_dts)
+        cursor = conn.connection.cursor()
+        cursor.copy_expert('COPY %s (s, p, o, context, lang, datatype) FROM STDIN' % self.quads.name, buf)
+        cursor.close()
 
-                res = o1 < o2
+    def bulk_load(self, quads, batch_size=BULK_BATCH_SIZE):
+        """
+        fast path for initial loads of large amounts of quads.
 
-            elif node['op'] == 'is':
+        Drops all indexes on the quads table, loads the quads using the backend's
+        fastest bulk path (COPY FROM STDIN on PostgreSQL, executemany with relaxed
+        journal_mode/synchronous and a large cache_size on SQLite, executemany
+        otherwise), removes duplicates, rebuilds the indexes and refreshes
+        statistics at the end.
+        Concurrent readers will see a table without indexes while loading.
+        Uses a connection of its own, cannot run inside session()/transaction().
 
-                o1 = self._expr2alchemy(node['expr'], var_map, var_lang, var_dts)
-                o2 = self._expr2alchemy(node['other'], var_map, var_lang, var_dts)
+        quads      -- iterable of (s, p, o, context) quads, consumed in batches of batch_size
 
-                res = o1.is_(o2)
+        returns the number of quads read
+        """
 
-            else:
-                raise Exception ('RelationalExpression op %s unknown.' % node['op'])
+        if getattr(self._local, 'conn', None) is not None:
+            raise Exception ('bulk_load() cannot run inside session() or transaction()')
 
-        elif node.name == 'Builtin_LANG':
+        dialect = self.engine.dialect.name
+        use_copy = dialect == 'postgresql' and self.engine.driver == 'psycopg2'
 
-            self._check_keys(node, set(['arg', '_vars']))
+        conn = self.engine.connect()
 
-            # logging.debug ('arg=%s' % node['arg'].__class__)
+        pragmas = {}
+        dropped = []
 
-            if not isinstance (node['arg'], rdflib.term.Variable):
-                raise Exception ('Builtin_LANG: argument expected to be a variable, %s (%s) found instead.' % (node['arg'], type(node['arg'])))
+        try:
 
-            res = var_lang[unicode(node['arg'])]
+            if dialect == 'sqlite':
+                for pragma, value in [('journal_mode', 'MEMORY'), ('synchronous', 'OFF'), ('cache_size', '-262144')]:
+                    pragmas[pragma] = conn.execute('PRAGMA %s' % pragma).scalar()
+                    conn.execute('PRAGMA %s=%s' % (pragma, value))
 
-        elif node.name == 'ConditionalAndExpression':
+            try:
 
-            self._check_keys(node, set(['expr', 'other', '_vars']))
+                # tables created by older versions lack some of our indexes,
+                # only drop (and later rebuild) the ones that actually exist
 
-            res = self._expr2alchemy(node['expr'], var_map, var_lang, var_dts)
+                existing = set([idx['name'] for idx in inspect(conn).get_indexes(self.quads.name)])
 
-            for e in node['other']:
-                
-                o = self._expr2alchemy(e, var_map, var_lang, var_dts)
+                logging.info('bulk_load: dropping indexes...')
+                for idx in self.quads.indexes:
+                    if idx.name in existing:
+                        idx.drop(conn)
+                        dropped.append(idx)
 
-                res = sql.and_(res, o)
+                trans = conn.begin()
 
-        elif node.name == 'ConditionalOrExpression':
+                try:
 
-            self._check_keys(node, set(['expr', 'other', '_vars']))
+                    cnt        = 0
+                    start_time = time()
 
-            res = self._expr2alchemy(node['expr'], var_map, var_lang, var_dts)
+                    quads = iter(quads)
 
-            for e in node['other']:
-                
-                o = self._expr2alchemy(e, var_map, var_lang, var_dts)
+                    while True:
 
-                res = sql.or_(res, o)
+                        batch = list(itertools.islice(quads, batch_size))
+                        if not batch:
+                            break
 
-        else:
+                        values = self._quad_values(conn, batch)
 
-            raise Exception ('expression node type %s unknown.' % node.name)
+                        if use_copy:
+                            self._copy_rows(conn, values)
+                        else:
+                            conn.execute(self.quads.insert().values(s        = sql.bindparam('b_s'),
+                                                                    p        = sql.bindparam('b_p'),
+                                                                    o        = sql.bindparam('b_o'),
+                                                                    context  = sql.bindparam('b_context'),
+                                                                    lang     = sql.bindparam('b_lang'),
+                                                                    datatype = sql.bindparam('b_datatype')),
+                                         values)
+                        cnt += len(values)
 
-        return res
+                        elapsed = time() - start_time
+                        logging.info('bulk_load: %9d quads, %8.1fs, %8.0f quads/s' % (cnt, elapsed, cnt / elapsed if elapsed > 0 else 0.0))
 
-    #
-    # convert a sparql select statement to an sqlalchemy SELECT statement
-    #
+                    # no unique index while loading -> remove duplicate edges now,
+                    # keeping the oldest row of each group
 
-    def _algebra2alchemy(self, node):
+                    logging.info('bulk_load: removing duplicates...')
 
-        res        = None
-        var_map    = {}
-        var_lang   = {}
-        var_dts    = {}
+                    keep = sql.select([func.min(self.quads.c.id).label('id')])\
+                              .group_by(self.quads.c.s, self.quads.c.p, self.quads.c.o, self.quads.c.context,
+                                        self.quads.c.lang, self.quads.c.datatype)\
+                              .alias('keep')
+                    conn.execute(self.quads.delete().where(~self.quads.c.id.in_(sql.select([keep.c.id]))))
 
-        if node.name == 'SelectQuery':
+                    trans.commit()
 
-            self._check_keys(node, set(['p', 'datasetClause', '_vars', 'PV']))
+                except:
+                    trans.rollback()
+                    raise
 
-            assert node['datasetClause'] is None # FIXME: implement
+            finally:
 
-            p_stmt, p_var_map, p_var_lang, p_var_dts = self._algebra2alchemy(node['p'])
+                logging.info('bulk_load: rebuilding indexes...')
+                for idx in dropped:
+                    idx.create(conn)
+
+        finally:
+
+            for pragma in pragmas:
+                conn.execute('PRAGMA %s=%s' % (pragma, pragmas[pragma]))
+
+            conn.close()
+
+            self._touch(None)
+
+        logging.info('bulk_load: updating statistics...')
+        self.update_stats()
+
+        elapsed = time() - start_time
+        logging.info('bulk_load: done, %d quads in %.1fs (%.0f quads/s)' % (cnt, elapsed, cnt / elapsed if elapsed > 0 else 0.0))
+
+        return cnt
+
+    #
+    # statistics, join ordering
+    #
+
+    def update_stats(self):
+        """
+        recompute per-predicate statistics (number of quads, distinct subjects and
+        objects) used to order triple patterns in queries. Does a full scan of the
+        quads table.
+        """
+
+        q = self.quads.c
+
+        sel = sql.select([q.p, func.count(q.id), func.count(q.s.distinct()), func.count(q.o.distinct())]).group_by(q.p)
+
+        with self.transaction() as conn:
+            conn.execute(self.stats.delete())
+            conn.execute(self.stats.insert().from_select(['p', 'cnt', 'distinct_s', 'distinct_o'], sel))
+
+        self._stats = None
+
+        # cached plans were ordered using the old numbers
+        self.plan_cache.clear()
+
+    def get_stats(self):
+        """dict mapping predicates to (cnt, distinct_s, distinct_o) tuples, empty if update_stats() was never run"""
+
+        stats = self._stats
+
+        if stats is None:
+
+            stats = {}
+
+            sel = sql.select([self._term_value(self.stats.c.p).label('p'),
+                              self.stats.c.cnt, self.stats.c.distinct_s, self.stats.c.distinct_o])
+
+            with self._connection() as conn:
+                for row in conn.execute(sel):
+                    stats[row['p']] = (row['cnt'], row['distinct_s'], row['distinct_o'])
+
+            self._stats = stats
+
+        return stats
+
+    def _estimate_triple(self, t, bound, stats, total):
+        """estimated number of rows matching triple pattern t given the variables in bound"""
+
+        s, p, o = t
+
+        s_bound = not isinstance(s, rdflib.term.Variable) or unicode(s) in bound
+        o_bound = not isinstance(o, rdflib.term.Variable) or unicode(o) in bound
+
+        if not stats:
+
+            # no statistics: subjects are more selective than objects, objects more than predicates
+
+            est = 1000000.0 if isinstance(p, rdflib.term.Variable) or isinstance(p, Path) else 10000.0
+            if s_bound:
+                est /= 1000.0
+            if o_bound:
+                est /= 100.0
+
+            return est
+
+        if isinstance(p, rdflib.term.Variable) or isinstance(p, Path):
+
+            est = float(total)
+            if s_bound:
+                est /= len(stats)
+            if o_bound:
+                est /= len(stats)
+
+            return est
+
+        cnt, distinct_s, distinct_o = stats.get(unicode(p), (0, 1, 1))
+
+        est = float(cnt)
+        if s_bound:
+            est /= max(distinct_s, 1)
+        if o_bound:
+            est /= max(distinct_o, 1)
+
+        return est
+
+    def _order_triples(self, triples, bound):
+        """
+        greedy join order for BGP triple patterns: start with the most selective
+        pattern, then always add the most selective pattern connected to the ones
+        chosen so far, so we never join unconnected patterns while connected ones remain.
+
+        bound -- names of variables bound before the BGP is evaluated
+        """
+
+        stats = self.get_stats()
+        total = sum([ st[0] for st in stats.values() ])
+
+        bound  = set(bound)
+        joined = set()
+        todo   = list(triples)
+        res    = []
+
+        while todo:
+
+            connected = [ t for t in todo if [ v for v in t if isinstance(v, rdflib.term.Variable) and unicode(v) in joined ] ]
+
+            best = min(connected or todo, key=lambda t: self._estimate_triple(t, bound, stats, total))
+
+            todo.remove(best)
+            res.append(best)
+
+            for v in best:
+                if isinstance(v, rdflib.term.Variable):
+                    bound.add(unicode(v))
+                    joined.add(unicode(v))
+
+        return res
+
+    def _check_keys(self, d, keys):
+        """ensure dict d has only the given keys"""
+        for k in d:
+            if not (k in keys):
+                raise Exception ('unexpected key found: %s' % k)
+
+    #
+    # convert an expression to sqlalchemy operators
+    #
+
+    def _expr2alchemy(self, node, var_map, var_lang, var_dts, ctx):
+
+        res = None
+
+        if isinstance(node, rdflib.term.Literal):
+
+            if node.value is None:
+                res = None
+            else:
+                res = unicode(node)
+
+        elif isinstance(node, rdflib.term.Variable):
+
+            var_name = unicode(node)
+
+            if var_name in var_map:
+                res = self._var_value(var_name, var_map, ctx)
+            elif var_name in ctx['params']:
+                res = self._bind_var(var_name)
+            else:
+                raise Exception ('unbound variable %s in expression.' % var_name)
+
+        elif isinstance (node, rdflib.term.URIRef):
+
+            res = unicode(node)
+
+        elif node.name == 'RelationalExpression':
+
+            self._check_keys(node, set(['expr', 'op', 'other', '_vars']))
+
+            o1 = self._expr2alchemy(node['expr'], var_map, var_lang, var_dts, ctx)
+            o2 = self._expr2alchemy(node['other'], var_map, var_lang, var_dts, ctx)
+
+            # numeric literals compared to computed numbers (e.g. COUNT() in HAVING) are passed as numbers
+
+            if self._is_numeric(node['expr'], ctx) and isinstance(node['other'], rdflib.term.Literal):
+                o2 = node['other'].toPython()
+            if self._is_numeric(node['other'], ctx) and isinstance(node['expr'], rdflib.term.Literal):
+                o1 = node['expr'].toPython()
+
+            if node['op'] == '=':
+
+                res = o1 == o2
+
+            elif node['op'] == '!=':
+
+                res = o1 != o2
+
+            elif node['op'] == '>=':
+
+                res = o1 >= o2
+
+            elif node['op'] == '<=':
+
+                res = o1 <= o2
+
+            elif node['op'] == '>':
+
+                res = o1 > o2
+
+            elif node['op'] == '<':
+
+                res = o1 < o2
+
+            elif node['op'] == 'is':
+
+                res = o1.is_(o2)
+
+            else:
+                raise Exception ('RelationalExpression op %s unknown.' % node['op'])
+
+        elif node.name == 'Builtin_LANG':
+
+            self._check_keys(node, set(['arg', '_vars']))
+
+            # logging.debug ('arg=%s' % node['arg'].__class__)
+
+            if not isinstance (node['arg'], rdflib.term.Variable):
+                raise Exception ('Builtin_LANG: argument expected to be a variable, %s (%s) found instead.' % (node['arg'], type(node['arg'])))
+
+            res = var_lang[unicode(node['arg'])]
+
+        elif node.name == 'ConditionalAndExpression':
+
+            self._check_keys(node, set(['expr', 'other', '_vars']))
+
+            res = self._expr2alchemy(node['expr'], var_map, var_lang, var_dts, ctx)
+
+            for e in node['other']:
+                
+                o = self._expr2alchemy(e, var_map, var_lang, var_dts, ctx)
+
+                res = sql.and_(res, o)
+
+        elif node.name == 'ConditionalOrExpression':
+
+            self._check_keys(node, set(['expr', 'other', '_vars']))
+
+            res = self._expr2alchemy(node['expr'], var_map, var_lang, var_dts, ctx)
+
+            for e in node['other']:
+                
+                o = self._expr2alchemy(e, var_map, var_lang, var_dts, ctx)
+
+                res = sql.or_(res, o)
+
+        elif node.name in ['Builtin_EXISTS', 'Builtin_NOTEXISTS']:
+
+            self._check_keys(node, set(['graph', '_vars']))
+
+            # rdflib's translation sets the graph pattern's algebra as an instance attribute,
+            # the 'graph' key still holds the parse tree. Attribute access falls back to the
+            # key when there is no such attribute, so always use node.graph here
+            res = self._exists(node.graph, var_map, var_lang, var_dts, ctx)
+
+            if node.name == 'Builtin_NOTEXISTS':
+                res = ~res
+
+        else:
+
+            raise Exception ('expression node type %s unknown.' % node.name)
+
+        return res
+
+    #
+    # convert a sparql select statement to an sqlalchemy SELECT statement
+    #
+
+    #
+    # property paths
+    #
+
+    def _path_const(self, term, ctx):
+        """SQL expression for a constant (or bind variable) path end point, None for variables"""
+
+        if isinstance(term, rdflib.term.Variable):
+            if not unicode(term) in ctx['params']:
+                return None
+            c = self._term_const(self._bind_var(unicode(term)))
+        else:
+            c = self._term_const(unicode(term))
+
+        if isinstance(c, basestring):
+            c = sql.literal(c, UnicodeText)
+
+        return c
+
+    def _graph_filter(self, quads, ctx):
+        """restrict quads (an alias of our quads table) to the graphs named in FROM clauses, if any"""
+
+        if ctx['graphs'] is None:
+            return sql.expression.true()
+
+        return quads.c.context.in_([ self._term_const(g) for g in ctx['graphs'] ])
+
+    def _path_select(self, sel_list, from_obj, where_clause):
+        """select with the columns every path select has: id, s, o, lang, datatype"""
+
+        s, o, lang, datatype = sel_list
+
+        return sql.select([s.label('id'), s.label('s'), o.label('o'), lang.label('lang'), datatype.label('datatype')],
+                          from_obj=from_obj).where(where_clause)
+
+    def _path_no_str(self):
+        """
+        missing language tag / datatype as stored in our quads table (empty strings in unique
+        quads tables), so UNIONs of path selects recognize IRIs reached in different ways as equal
+        """
+
+        if self.unique_quads:
+            return sql.literal(u'', String)
+
+        return sql.cast(sql.null(), String)
+
+    def _path_nodes(self, ctx, start):
+        """
+        zero length paths: every node connects to itself. Returns a list of selects
+        to be UNIONed by the caller (SQLite does not support nested compound selects)
+        """
+
+        null_str = self._path_no_str()
+
+        if start is not None:
+            return [ sql.select([start.label('id'), start.label('s'), start.label('o'), null_str.label('lang'), null_str.label('datatype')]) ]
+
+        q = self.quads.alias()
+        subjects = sql.select([q.c.s.label('id'), q.c.s.label('s'), q.c.s.label('o'), null_str.label('lang'), null_str.label('datatype')])\
+                      .where(self._graph_filter(q, ctx))
+        q = self.quads.alias()
+        objects  = sql.select([q.c.o.label('id'), q.c.o.label('s'), q.c.o.label('o'), q.c.lang.label('lang'), q.c.datatype.label('datatype')])\
+                      .where(self._graph_filter(q, ctx))
+
+        return [ subjects, objects ]
+
+    def _inv_path(self, path):
+        """path matching the inverse of path, with the inversion pushed down to the predicates: ^(a/b*) = ^b*/^a"""
+
+        if isinstance(path, InvPath):
+            return path.arg
+        if isinstance(path, SequencePath):
+            return SequencePath(*[ self._inv_path(arg) for arg in reversed(path.args) ])
+        if isinstance(path, AlternativePath):
+            return AlternativePath(*[ self._inv_path(arg) for arg in path.args ])
+        if isinstance(path, MulPath):
+            return MulPath(self._inv_path(path.path), path.mod)
+
+        return InvPath(path)
+
+    def _path2alchemy(self, path, ctx, start=None):
+        """
+        compile a property path to an aliased select of (id, s, o, lang, datatype) rows
+
+        start -- optional SQL expression s is restricted to, used to seed recursive
+                 evaluation from a constant instead of computing the full closure
+        """
+
+        null_str = self._path_no_str()
+
+        if isinstance(path, rdflib.term.URIRef):
+
+            q = self.quads.alias()
+
+            where_clause = sql.expression.and_(q.c.p == self._term_const(unicode(path)), self._graph_filter(q, ctx))
+            if start is not None:
+                where_clause = sql.expression.and_(where_clause, q.c.s == start)
+
+            return self._path_select([q.c.s, q.c.o, q.c.lang, q.c.datatype], [q], where_clause).alias()
+
+        if isinstance(path, InvPath):
+
+            if isinstance(path.arg, rdflib.term.URIRef):
+
+                q = self.quads.alias()
+
+                where_clause = sql.expression.and_(q.c.p == self._term_const(unicode(path.arg)), self._graph_filter(q, ctx))
+                if start is not None:
+                    where_clause = sql.expression.and_(where_clause, q.c.o == start)
+
+                return self._path_select([q.c.o, q.c.s, null_str, null_str], [q], where_clause).alias()
+
+            if start is not None:
+                # seed evaluation from start: walk the inverted path forward
+                return self._path2alchemy(self._inv_path(path.arg), ctx, start)
+
+            p = self._path2alchemy(path.arg, ctx)
+
+            return self._path_select([p.c.o, p.c.s, null_str, null_str], [p], sql.expression.true()).alias()
+
+        if isinstance(path, SequencePath):
+
+            steps = [ self._path2alchemy(path.args[0], ctx, start) ]
+            where_clause = sql.expression.true()
+
+            for arg in path.args[1:]:
+                step = self._path2alchemy(arg, ctx)
+                where_clause = sql.expression.and_(where_clause, steps[-1].c.o == step.c.s)
+                steps.append(step)
+
+            first = steps[0]
+            last  = steps[-1]
+
+            return self._path_select([first.c.s, last.c.o, last.c.lang, last.c.datatype], steps, where_clause).alias()
+
+        if isinstance(path, AlternativePath):
+
+            alts = [ sql.select([p.c.id, p.c.s, p.c.o, p.c.lang, p.c.datatype])
+                     for p in [ self._path2alchemy(arg, ctx, start) for arg in path.args ] ]
+
+            return sql.union_all(*alts).alias()
+
+        if isinstance(path, MulPath):
+
+            sels = []
+
+            if path.zero:
+                sels.extend(self._path_nodes(ctx, start))
+
+            if not path.more:
+
+                p = self._path2alchemy(path.path, ctx, start)
+                sels.append(sql.select([p.c.id, p.c.s, p.c.o, p.c.lang, p.c.datatype]))
+
+            else:
+
+                # WITH RECURSIVE: without a depth bound UNION drops rows we have seen
+                # before, so cycles end the recursion. With a depth bound we need a depth
+                # column which defeats that, so we rely on the bound instead.
+
+                depth = self.max_path_depth
+
+                base = self._path2alchemy(path.path, ctx, start)
+
+                cols = [base.c.s, base.c.o, base.c.lang, base.c.datatype]
+                if depth:
+                    cols.append(sql.literal_column('1').label('depth'))
+
+                cte = sql.select(cols).cte('path_%d' % next(ctx['ctes']), recursive=True)
+
+                step = self._path2alchemy(path.path, ctx)
+
+                rcols = [cte.c.s, step.c.o, step.c.lang, step.c.datatype]
+                rsel  = sql.select(rcols).where(cte.c.o == step.c.s)
+                if depth:
+                    rsel = sql.select(rcols + [(cte.c.depth + 1).label('depth')]).where(sql.expression.and_(cte.c.o == step.c.s, cte.c.depth < depth))
+                    cte  = cte.union_all(rsel)
+                else:
+                    cte  = cte.union(rsel)
+
+                sels.append(sql.select([cte.c.s.label('id'), cte.c.s, cte.c.o, cte.c.lang, cte.c.datatype]).distinct())
+
+            if len(sels) == 1:
+                return sels[0].alias()
+
+            return sql.union(*sels).alias()
+
+        raise Exception ('FIXME: unsupported property path: %s' % repr(path))
+
+    def _conjuncts(self, expr):
+        """split a filter expression into the list of its top level conjuncts"""
+
+        if isinstance(expr, CompValue) and expr.name == 'ConditionalAndExpression':
+            res = self._conjuncts(expr['expr'])
+            for e in expr['other']:
+                res.extend(self._conjuncts(e))
+            return res
+
+        return [expr]
+
+    def _expr_vars(self, expr):
+        """names of all variables referenced in expression expr"""
+
+        if isinstance(expr, rdflib.term.Variable):
+            return set([unicode(expr)])
+
+        res = set()
+
+        if isinstance(expr, CompValue):
+            for k in expr:
+                if k != '_vars':
+                    res |= self._expr_vars(expr[k])
+
+        elif isinstance(expr, list):
+            for e in expr:
+                res |= self._expr_vars(e)
+
+        return res
+
+    def _exists(self, graph, var_map, var_lang, var_dts, ctx):
+        """
+        EXISTS subquery for graph pattern graph, correlated with the enclosing
+        statement on the variables both have in common
+        """
+
+        # filters inside (NOT) EXISTS can see variables bound outside, so we evaluate
+        # them in the WHERE clause of the EXISTS subquery itself
+
+        exprs = []
+        while graph.name == 'Filter':
+            exprs.append(graph['expr'])
+            graph = graph['p']
+
+        g_stmt, g_var_map, g_var_lang, g_var_dts = self._algebra2alchemy(graph, ctx)
+
+        cond = sql.expression.true()
+        for var_name in g_var_map:
+            if var_name in var_map:
+                cond = sql.expression.and_(cond, g_var_map[var_name] == var_map[var_name])
+
+        if exprs:
+
+            c_var_map  = dict(var_map)
+            c_var_map.update(g_var_map)
+            c_var_lang = dict(var_lang)
+            c_var_lang.update(g_var_lang)
+            c_var_dts  = dict(var_dts)
+            c_var_dts.update(g_var_dts)
+
+            for e in exprs:
+                cond = sql.expression.and_(cond, self._expr2alchemy(e, c_var_map, c_var_lang, c_var_dts, ctx))
+
+        return sql.exists(sql.select([g_stmt.c[ID_COLUMN_NAME]]).select_from(g_stmt).where(cond))
+
+    def _var_value(self, var_name, var_map, ctx):
+        """SQL expression yielding the value of a variable: stored terms get decoded, computed values are used as-is"""
+
+        if var_name in ctx['computed']:
+            return var_map[var_name]
+
+        return self._term_value(var_map[var_name])
+
+    def _is_numeric(self, expr, ctx):
+        """True if expr is a variable holding computed numbers (e.g. the result of COUNT())"""
+
+        return isinstance(expr, rdflib.term.Variable) and ctx['computed'].get(unicode(expr)) in NUMERIC_DATATYPES
+
+    def _extreme(self, agg, partition_by, var_map, var_lang, var_dts, ctx):
+        """
+        window functions picking the original term (value, lang, datatype) of the row
+        holding the smallest/largest value of the MIN()/MAX() aggregate agg in its group.
+        Numbers compare by value, everything else by lexical form.
+        returns None if agg compares plain values which need no special treatment
+        """
+
+        if not isinstance(agg['vars'], rdflib.term.Variable) or not unicode(agg['vars']) in var_dts:
+            return None
+
+        v    = self._expr2alchemy(agg['vars'], var_map, var_lang, var_dts, ctx)
+        lang = var_lang.get(unicode(agg['vars']))
+        dt   = var_dts[unicode(agg['vars'])]
+
+        num  = sql.case([(dt.in_(NUMERIC_DATATYPES), sql.cast(v, Float))], else_=sql.null())
+
+        # unbound values last, numbers (if any) before everything else
+
+        order_by = [sql.case([(v == None, 2), (num == None, 1)], else_=0)]
+        if agg.name == 'Aggregate_Max':
+            order_by.extend([num.desc(), v.desc()])
+        else:
+            order_by.extend([num, v])
+
+        return [ func.first_value(e).over(partition_by=partition_by or None, order_by=order_by) if e is not None else None
+                 for e in [v, lang, dt] ]
+
+    def _aggregate(self, agg, p_stmt, var_map, var_lang, var_dts, extremes, ctx):
+        """
+        compile an Aggregate_* node to an SQL aggregate function,
+        returns (value, lang, datatype) expressions
+
+        extremes -- maps result variable names of MIN()/MAX() aggregates to the columns
+                    computed by the window functions of _extreme()
+        """
+
+        distinct = bool(agg.get('distinct'))
+
+        if agg.name == 'Aggregate_Count':
+
+            if agg['vars'] == '*':
+                if distinct:
+                    raise Exception ('COUNT(DISTINCT *) is not supported.')
+                value = func.count()
+            else:
+                col   = var_map[unicode(agg['vars'])]
+                value = func.count(col.distinct() if distinct else col)
+
+            return value, sql.null(), sql.literal(unicode(XSD.integer), UnicodeText)
+
+        v     = self._expr2alchemy(agg['vars'], var_map, var_lang, var_dts, ctx)
+        lang  = var_lang.get(unicode(agg['vars'])) if isinstance(agg['vars'], rdflib.term.Variable) else None
+        dt    = var_dts.get(unicode(agg['vars']))  if isinstance(agg['vars'], rdflib.term.Variable) else None
+
+        if agg.name == 'Aggregate_Avg':
+
+            num   = sql.cast(v, Float)
+            if distinct:
+                num = num.distinct()
+
+            return func.avg(num), sql.null(), sql.literal(unicode(XSD.double), UnicodeText)
+
+        if agg.name == 'Aggregate_Sum':
+
+            if dt is None:
+                num = sql.cast(v, Float)
+                return func.sum(num.distinct() if distinct else num), sql.null(), sql.literal(unicode(XSD.double), UnicodeText)
+
+            # sums of integers stay integers. NUMERIC keeps them exact, the driver's
+            # values (int, Decimal) are passed on untouched
+
+            num = sql.cast(v, Numeric)
+            if distinct:
+                num = num.distinct()
+            value = sql.type_coerce(func.sum(num), NullType)
+
+            all_int = func.sum(sql.case([(dt.in_(INTEGER_DATATYPES), 0)], else_=1)) == 0
+            dt      = sql.case([(all_int, sql.literal(unicode(XSD.integer), UnicodeText))],
+                               else_=sql.literal(unicode(XSD.double), UnicodeText))
+
+            return value, sql.null(), dt
+
+        if agg.name in ['Aggregate_Min', 'Aggregate_Max']:
+
+            var_name = unicode(agg['res'])
+
+            if not var_name in extremes:
+                agg_func = func.min if agg.name == 'Aggregate_Min' else func.max
+                return agg_func(v), sql.null(), sql.null()
+
+            # all rows of a group carry the same term here
+
+            v, lang, dt = extremes[var_name]
+
+            return func.min(v), func.min(lang) if lang is not None else sql.null(), func.min(dt)
+
+        if agg.name == 'Aggregate_Sample':
+
+            return func.min(v), func.min(lang) if lang is not None else sql.null(), func.min(dt) if dt is not None else sql.null()
+
+        if agg.name == 'Aggregate_GroupConcat':
+
+            separator = unicode(agg['separator']) if 'separator' in agg else u' '
+            if distinct:
+                v = v.distinct()
+
+            dialect = self.engine.dialect.name
+            if dialect == 'postgresql':
+                value = func.string_agg(v, separator)
+            elif dialect == 'mysql':
+                value = func.group_concat(v.op('SEPARATOR')(separator))
+            else:
+                value = func.group_concat(v, separator)
+
+            return value, sql.null(), sql.null()
+
+        raise Exception ('aggregate %s unknown.' % agg.name)
+
+    def _order_keys(self, expr, var_map, var_lang, var_dts, ctx):
+        """
+        SQL sort keys for an ORDER BY expression: variables holding numeric literals
+        sort by value, everything else by lexical form. ISO dates and dateTimes come
+        out in chronological order only if they all have the same timezone offset
+        (or all have none)
+        """
+
+        if isinstance(expr, rdflib.term.Variable) and unicode(expr) in var_map:
+
+            var_name = unicode(expr)
+            value    = self._var_value(var_name, var_map, ctx)
+
+            if not var_name in var_dts:
+                return [value]
+
+            num = sql.case([(var_dts[var_name].in_(NUMERIC_DATATYPES), sql.cast(value, Float))], else_=sql.null())
+
+            return [num, value]
+
+        return [self._expr2alchemy(expr, var_map, var_lang, var_dts, ctx)]
+
+    def _order_columns(self, stmt, ctx):
+        """order key columns (see OrderBy) to carry through stmt"""
+
+        return [ stmt.c[label] for label, desc in ctx['order_by'] if label in stmt.c ]
+
+    def _apply_order(self, sel, stmt, ctx):
+        """add ORDER BY clause on stmt's order key columns to select sel"""
+
+        for label, desc in ctx['order_by']:
+            if label in stmt.c:
+                sel = sel.order_by(stmt.c[label].desc() if desc else stmt.c[label].asc())
+
+        return sel
+
+    def _algebra2alchemy(self, node, ctx, filters=None):
+        """
+        filters -- list of filter conjuncts pushed down by an enclosing Filter node.
+                   Conjuncts applied here (or further down) are removed from the list.
+        """
+
+        res        = None
+        var_map    = {}
+        var_lang   = {}
+        var_dts    = {}
+
+        if node.name == 'SelectQuery':
+
+            self._check_keys(node, set(['p', 'datasetClause', '_vars', 'PV']))
+
+            self._dataset(node, ctx)
+
+            p_stmt, p_var_map, p_var_lang, p_var_dts = self._algebra2alchemy(node['p'], ctx)
+
+            for v in node['PV']:
+                var_name = unicode(v)
+                var_map[var_name] = p_var_map[var_name]
+
+                if var_name in p_var_lang:
+                    var_lang[var_name] = p_var_lang[var_name]
+                if var_name in p_var_dts:
+                    var_dts[var_name] = p_var_dts[var_name]
+
+            sel_list = [p_stmt.c[ID_COLUMN_NAME]]
+            for var_name in var_map:
+                sel_list.append(self._var_value(var_name, var_map, ctx).label(var_name)) # decode terms, if needed
+            for var_name in var_lang:
+                sel_list.append(var_lang[var_name].label(var_name + '_lang'))
+            for var_name in var_dts:
+                sel_list.append(var_dts[var_name].label(var_name + '_dt'))
+            sel_list.extend(self._order_columns(p_stmt, ctx))
+
+            res = self._apply_order(sql.select(sel_list).select_from(p_stmt), p_stmt, ctx).alias()
+
+            for var_name in var_map:
+                var_map[var_name] = res.c[var_name]
+            for var_name in var_lang:
+                var_lang[var_name] = res.c[var_name + '_lang']
+            for var_name in var_dts:
+                var_dts[var_name] = res.c[var_name + '_dt']
+
+            self._debug_sql('SelectQuery', res)
+
+        elif node.name == 'Project':
+
+            self._check_keys(node, set(['p', '_vars', 'PV']))
+
+            p_stmt, p_var_map, p_var_lang, p_var_dts = self._algebra2alchemy(node['p'], ctx)
+
+            for v in node['PV']:
+                var_name = unicode(v)
+                var_map[var_name] = p_var_map[var_name]
+
+                if var_name in p_var_lang:
+                    var_lang[var_name] = p_var_lang[var_name]
+                if var_name in p_var_dts:
+                    var_dts[var_name] = p_var_dts[var_name]
+
+            sel_list = [p_stmt.c[ID_COLUMN_NAME]]
+            for var_name in var_map:
+                sel_list.append(var_map[var_name].label(var_name))
+            for var_name in var_lang:
+                sel_list.append(var_lang[var_name].label(var_name + '_lang'))
+            for var_name in var_dts:
+                sel_list.append(var_dts[var_name].label(var_name + '_dt'))
+            sel_list.extend(self._order_columns(p_stmt, ctx))
+
+            res = sql.select(sel_list).select_from(p_stmt).alias()
+
+            for var_name in var_map:
+                var_map[var_name] = res.c[var_name]
+            for var_name in var_lang:
+                var_lang[var_name] = res.c[var_name + '_lang']
+            for var_name in var_dts:
+                var_dts[var_name] = res.c[var_name + '_dt']
+
+            self._debug_sql('Project', res)
+
+        elif node.name == 'Filter':
+
+            self._check_keys(node, set(['p', 'expr', '_vars']))
+
+            # push conjuncts down to the BGP that binds all their variables,
+            # so they can prune rows before any joins happen
+
+            pending = self._conjuncts(node['expr'])
+
+            p_stmt, var_map, var_lang, var_dts = self._algebra2alchemy(node['p'], ctx, pending)
+
+            if not pending:
+                return p_stmt, var_map, var_lang, var_dts
+
+            expr = self._expr2alchemy(pending[0], var_map, var_lang, var_dts, ctx)
+            for e in pending[1:]:
+                expr = sql.and_(expr, self._expr2alchemy(e, var_map, var_lang, var_dts, ctx))
+
+            sel_list = [p_stmt.c[ID_COLUMN_NAME]]
+            for var_name in var_map:
+                sel_list.append(var_map[var_name].label(var_name))
+            for var_name in var_lang:
+                sel_list.append(var_lang[var_name].label(var_name + '_lang'))
+            for var_name in var_dts:
+                sel_list.append(var_dts[var_name].label(var_name + '_dt'))
+            sel_list.extend(self._order_columns(p_stmt, ctx))
+
+            res = sql.select(sel_list).select_from(p_stmt).where(expr).alias()
+
+            for var_name in var_map:
+                var_map[var_name] = res.c[var_name]
+            for var_name in var_lang:
+                var_lang[var_name] = res.c[var_name + '_lang']
+            for var_name in var_dts:
+                var_dts[var_name] = res.c[var_name + '_dt']
+
+            self._debug_sql('Filter', res)
+
+        elif node.name == 'Distinct':
+
+            self._check_keys(node, set(['p', '_vars']))
+            p_stmt, var_map, var_lang, var_dts = self._algebra2alchemy(node['p'], ctx)
+
+            sel_list = []
+
+            if len(var_map)>0:
+                sel_list.append (var_map[var_map.keys()[0]].label(ID_COLUMN_NAME)) # re-use arbitrary variable as id column
+            else:
+                sel_list.append (p_stmt.c[ID_COLUMN_NAME])
+
+            for var_name in var_map:
+                sel_list.append(var_map[var_name].label(var_name))
+            for var_name in var_lang:
+                sel_list.append(var_lang[var_name].label(var_name + '_lang'))
+            for var_name in var_dts:
+                sel_list.append(var_dts[var_name].label(var_name + '_dt'))
+
+            order_cols = self._order_columns(p_stmt, ctx)
+
+            if order_cols:
+
+                # DISTINCT over the order keys as well could yield duplicates, so group by our
+                # variables instead and sort each group by its first (or last, if descending) key
+
+                group_by = sel_list[1:]
+                for label, desc in ctx['order_by']:
+                    if label in p_stmt.c:
+                        sel_list.append((func.max(p_stmt.c[label]) if desc else func.min(p_stmt.c[label])).label(label))
+
+                res = sql.select(sel_list).select_from(p_stmt).group_by(*group_by).alias()
+
+            else:
+                res = sql.select(sel_list).select_from(p_stmt).distinct().alias()
+
+            for var_name in var_map:
+                var_map[var_name] = res.c[var_name]
+            for var_name in var_lang:
+                var_lang[var_name] = res.c[var_name + '_lang']
+            for var_name in var_dts:
+                var_dts[var_name] = res.c[var_name + '_dt']
+
+            self._debug_sql('Distinct', res)
+
+        elif node.name == 'Slice':
+
+            self._check_keys(node, set(['start', 'length', 'p', '_vars']))
+            p_stmt, var_map, var_lang, var_dts = self._algebra2alchemy(node['p'], ctx)
+
+            sel_list = []
+
+            if len(var_map)>0:
+                sel_list.append (var_map[var_map.keys()[0]].label(ID_COLUMN_NAME)) # re-use arbitrary variable as id column
+            else:
+                sel_list.append (p_stmt.c[ID_COLUMN_NAME])
+
+            for var_name in var_map:
+                sel_list.append(var_map[var_name].label(var_name))
+            for var_name in var_lang:
+                sel_list.append(var_lang[var_name].label(var_name + '_lang'))
+            for var_name in var_dts:
+                sel_list.append(var_dts[var_name].label(var_name + '_dt'))
+
+            sel = sql.select(sel_list + self._order_columns(p_stmt, ctx)).select_from(p_stmt)
+
+            # ORDER BY ... LIMIT lets the database do a top-k scan. Rows tying on the
+            # ORDER BY keys (all of them without one) are sorted by all their variables,
+            # ids alone repeat across the rows of joins. Only identical solutions tie
+            # then, so pages are deterministic
+
+            if self._order_columns(p_stmt, ctx):
+                sel = self._apply_order(sel, p_stmt, ctx)
+
+            tie_breakers = var_map.values() + var_lang.values() + var_dts.values()
+            sel = sel.order_by(*(tie_breakers or [p_stmt.c[ID_COLUMN_NAME]]))
+
+            res = sel.offset(node['start']).limit(node['length']).alias()
+
+            for var_name in var_map:
+                var_map[var_name] = res.c[var_name]
+            for var_name in var_lang:
+                var_lang[var_name] = res.c[var_name + '_lang']
+            for var_name in var_dts:
+                var_dts[var_name] = res.c[var_name + '_dt']
+
+            self._debug_sql('Slice', res)
+
+        elif node.name == 'AggregateJoin':
+
+            self._check_keys(node, set(['A', 'p', '_vars']))
+
+            group = node['p']
+            assert group.name == 'Group'
+            self._check_keys(group, set(['expr', 'p', '_vars']))
+
+            p_stmt, p_var_map, p_var_lang, p_var_dts = self._algebra2alchemy(group['p'], ctx)
+
+            # MIN()/MAX() return the original term of the row holding the extreme value:
+            # window functions in a subselect below the GROUP BY pick it per group
+
+            partition_by = [ m[unicode(e)] for e in group['expr'] or [] for m in [p_var_map, p_var_lang, p_var_dts] if unicode(e) in m ]
+
+            extremes = {}
+            w_cols   = []
+
+            for agg in node['A']:
+
+                if not agg.name in ['Aggregate_Min', 'Aggregate_Max']:
+                    continue
+
+                w = self._extreme(agg, partition_by, p_var_map, p_var_lang, p_var_dts, ctx)
+                if w is None:
+                    continue
+
+                var_name = unicode(agg['res'])
+                extremes[var_name] = [ e.label('%s_%s' % (var_name, suffix)) if e is not None else None
+                                       for e, suffix in zip(w, ['w', 'w_lang', 'w_dt']) ]
+                w_cols.extend([ e for e in extremes[var_name] if e is not None ])
+
+            if w_cols:
+
+                p_stmt = sql.select([p_stmt] + w_cols).alias()
+
+                for m in [p_var_map, p_var_lang, p_var_dts]:
+                    for var_name in m:
+                        m[var_name] = p_stmt.corresponding_column(m[var_name])
+                for var_name in extremes:
+                    extremes[var_name] = [ p_stmt.c[e.name] if e is not None else None for e in extremes[var_name] ]
+
+            # GROUP BY variables (terms are the same if value, language and datatype match)
+
+            sel_list = [func.min(p_stmt.c[ID_COLUMN_NAME]).label(ID_COLUMN_NAME)]
+            group_by = []
+
+            for e in group['expr'] or []:
+
+                if not isinstance(e, rdflib.term.Variable):
+                    raise Exception ('FIXME: GROUP BY supports variables only, %s found.' % repr(e))
+
+                var_name = unicode(e)
 
-            for v in node['PV']:
-                var_name = unicode(v)
                 var_map[var_name] = p_var_map[var_name]
+                sel_list.append(p_var_map[var_name].label(var_name))
+                group_by.append(p_var_map[var_name])
+
+                if var_name in p_var_lang:
+                    var_lang[var_name] = p_var_lang[var_name]
+                    sel_list.append(p_var_lang[var_name].label(var_name + '_lang'))
+                    group_by.append(p_var_lang[var_name])
+                if var_name in p_var_dts:
+                    var_dts[var_name] = p_var_dts[var_name]
+                    sel_list.append(p_var_dts[var_name].label(var_name + '_dt'))
+                    group_by.append(p_var_dts[var_name])
+
+            # aggregates yield plain values, not encoded terms
+
+            for agg in node['A']:
+
+                var_name = unicode(agg['res'])
+
+                value, lang, dt = self._aggregate(agg, p_stmt, p_var_map, p_var_lang, p_var_dts, extremes, ctx)
+
+                var_map[var_name]  = value
+                var_lang[var_name] = lang
+                var_dts[var_name]  = dt
+                sel_list.extend([value.label(var_name), lang.label(var_name + '_lang'), dt.label(var_name + '_dt')])
+
+                ctx['computed'][var_name] = unicode(XSD.integer) if agg.name == 'Aggregate_Count' else \
+                                            unicode(XSD.double)  if agg.name in ['Aggregate_Sum', 'Aggregate_Avg'] else None
+
+            sel = sql.select(sel_list).select_from(p_stmt)
+            if group_by:
+                sel = sel.group_by(*group_by)
+            res = sel.alias()
+
+            for var_name in var_map:
+                var_map[var_name] = res.c[var_name]
+            for var_name in var_lang:
+                var_lang[var_name] = res.c[var_name + '_lang']
+            for var_name in var_dts:
+                var_dts[var_name] = res.c[var_name + '_dt']
+
+            self._debug_sql('AggregateJoin', res)
+
+        elif node.name == 'Extend':
+
+            self._check_keys(node, set(['p', 'var', 'expr', '_vars']))
+
+            p_stmt, var_map, var_lang, var_dts = self._algebra2alchemy(node['p'], ctx, filters)
+
+            var_name = unicode(node['var'])
+            expr     = node['expr']
+
+            if expr == node['var']:
+                return p_stmt, var_map, var_lang, var_dts
+
+            # rdflib re-binds grouped variables to samples of themselves, the new binding wins
+
+            var_map.pop(var_name, None)
+            var_lang.pop(var_name, None)
+            var_dts.pop(var_name, None)
+            ctx['computed'].pop(var_name, None)
+
+            sel_list = [p_stmt.c[ID_COLUMN_NAME]]
+            for vn in var_map:
+                sel_list.append(var_map[vn].label(vn))
+            for vn in var_lang:
+                sel_list.append(var_lang[vn].label(vn + '_lang'))
+            for vn in var_dts:
+                sel_list.append(var_dts[vn].label(vn + '_dt'))
+            sel_list.extend(self._order_columns(p_stmt, ctx))
+
+            if isinstance(expr, rdflib.term.Variable) and unicode(expr) in var_map:
+
+                # plain renaming, e.g. (?__agg_1__ AS ?count)
+
+                src = unicode(expr)
+
+                sel_list.append(var_map[src].label(var_name))
+                if src in var_lang:
+                    sel_list.append(var_lang[src].label(var_name + '_lang'))
+                if src in var_dts:
+                    sel_list.append(var_dts[src].label(var_name + '_dt'))
+                if src in ctx['computed']:
+                    ctx['computed'][var_name] = ctx['computed'][src]
+
+                var_map[var_name] = None
+                if src in var_lang:
+                    var_lang[var_name] = None
+                if src in var_dts:
+                    var_dts[var_name] = None
+
+            else:
+
+                sel_list.append(self._expr2alchemy(expr, var_map, var_lang, var_dts, ctx).label(var_name))
+                ctx['computed'][var_name] = None
+                var_map[var_name] = None
+
+            res = sql.select(sel_list).select_from(p_stmt).alias()
+
+            for vn in var_map:
+                var_map[vn] = res.c[vn]
+            for vn in var_lang:
+                var_lang[vn] = res.c[vn + '_lang']
+            for vn in var_dts:
+                var_dts[vn] = res.c[vn + '_dt']
+
+            self._debug_sql('Extend', res)
+
+        elif node.name == 'Join':
+
+            self._check_keys(node, set(['p1', 'p2', 'lazy', '_vars']))
+
+            # both sides are required, so filters may be pushed into either of them
+
+            p1_stmt, p1_var_map, p1_var_lang, p1_var_dts = self._algebra2alchemy(node['p1'], ctx, filters)
+            p2_stmt, p2_var_map, p2_var_lang, p2_var_dts = self._algebra2alchemy(node['p2'], ctx, filters)
+
+            # joins with the empty pattern are no-ops
+            if node['p1'].name == 'BGP' and not node['p1']['triples']:
+                return p2_stmt, p2_var_map, p2_var_lang, p2_var_dts
+            if node['p2'].name == 'BGP' and not node['p2']['triples']:
+                return p1_stmt, p1_var_map, p1_var_lang, p1_var_dts
+
+            on_expr = sql.expression.true()
+
+            for var_name in p1_var_map:
+                var_map[var_name] = p1_var_map[var_name]
+            for var_name in p1_var_lang:
+                var_lang[var_name] = p1_var_lang[var_name]
+            for var_name in p1_var_dts:
+                var_dts[var_name] = p1_var_dts[var_name]
+
+            for var_name in p2_var_map:
+                if not var_name in p1_var_map:
+                    var_map[var_name] = p2_var_map[var_name]
+                    continue
+                on_expr = sql.expression.and_(on_expr, p1_var_map[var_name] == p2_var_map[var_name])
+            for var_name in p2_var_lang:
+                if not var_name in p1_var_lang:
+                    var_lang[var_name] = p2_var_lang[var_name]
+            for var_name in p2_var_dts:
+                if not var_name in p1_var_dts:
+                    var_dts[var_name] = p2_var_dts[var_name]
+
+            sel_list = [p1_stmt.c[ID_COLUMN_NAME]]
+            for var_name in var_map:
+                sel_list.append(var_map[var_name].label(var_name))
+            for var_name in var_lang:
+                sel_list.append(var_lang[var_name].label(var_name + '_lang'))
+            for var_name in var_dts:
+                sel_list.append(var_dts[var_name].label(var_name + '_dt'))
+            sel_list.extend(self._order_columns(p1_stmt, ctx))
+
+            res = sql.select(sel_list).select_from(p1_stmt.join(p2_stmt, on_expr)).alias()
+
+            for var_name in var_map:
+                var_map[var_name] = res.c[var_name]
+            for var_name in var_lang:
+                var_lang[var_name] = res.c[var_name + '_lang']
+            for var_name in var_dts:
+                var_dts[var_name] = res.c[var_name + '_dt']
+
+            self._debug_sql('Join', res)
+
+        elif node.name == 'Union':
+
+            self._check_keys(node, set(['p1', 'p2', '_vars']))
+
+            # UNION ALL, both sides padded with NULLs to the same list of columns
+
+            p1_stmt, p1_var_map, p1_var_lang, p1_var_dts = self._algebra2alchemy(node['p1'], ctx)
+            p2_stmt, p2_var_map, p2_var_lang, p2_var_dts = self._algebra2alchemy(node['p2'], ctx)
+
+            var_names  = sorted(set(p1_var_map)  | set(p2_var_map))
+            lang_names = sorted(set(p1_var_lang) | set(p2_var_lang))
+            dt_names   = sorted(set(p1_var_dts)  | set(p2_var_dts))
+
+            sels = []
+            for p_stmt, p_var_map, p_var_lang, p_var_dts in [(p1_stmt, p1_var_map, p1_var_lang, p1_var_dts),
+                                                             (p2_stmt, p2_var_map, p2_var_lang, p2_var_dts)]:
+
+                sel_list = [p_stmt.c[ID_COLUMN_NAME]]
+                for var_name in var_names:
+                    sel_list.append((p_var_map[var_name] if var_name in p_var_map else sql.null()).label(var_name))
+                for var_name in lang_names:
+                    sel_list.append((p_var_lang[var_name] if var_name in p_var_lang else sql.null()).label(var_name + '_lang'))
+                for var_name in dt_names:
+                    sel_list.append((p_var_dts[var_name] if var_name in p_var_dts else sql.null()).label(var_name + '_dt'))
+
+                sels.append(sql.select(sel_list).select_from(p_stmt))
+
+            res = sql.union_all(*sels).alias()
+
+            for var_name in var_names:
+                var_map[var_name] = res.c[var_name]
+            for var_name in lang_names:
+                var_lang[var_name] = res.c[var_name + '_lang']
+            for var_name in dt_names:
+                var_dts[var_name] = res.c[var_name + '_dt']
+
+            self._debug_sql('Union', res)
+
+        elif node.name == 'Minus':
+
+            self._check_keys(node, set(['p1', 'p2', '_vars']))
+
+            # anti join: drop solutions of p1 compatible with a solution of p2. Solutions
+            # sharing no variables are never compatible, so MINUS removes nothing then.
+
+            p_stmt,  var_map,    var_lang,    var_dts    = self._algebra2alchemy(node['p1'], ctx, filters)
+            p2_stmt, p2_var_map, p2_var_lang, p2_var_dts = self._algebra2alchemy(node['p2'], ctx)
+
+            shared = [ var_name for var_name in p2_var_map if var_name in var_map ]
+
+            sel_list = [p_stmt.c[ID_COLUMN_NAME]]
+            for var_name in var_map:
+                sel_list.append(var_map[var_name].label(var_name))
+            for var_name in var_lang:
+                sel_list.append(var_lang[var_name].label(var_name + '_lang'))
+            for var_name in var_dts:
+                sel_list.append(var_dts[var_name].label(var_name + '_dt'))
+            sel_list.extend(self._order_columns(p_stmt, ctx))
+
+            sel = sql.select(sel_list).select_from(p_stmt)
+
+            if shared:
+                cond = sql.expression.and_(*[ p2_var_map[var_name] == var_map[var_name] for var_name in shared ])
+                sel  = sel.where(~sql.exists(sql.select([p2_stmt.c[ID_COLUMN_NAME]]).select_from(p2_stmt).where(cond)))
+
+            res = sel.alias()
+
+            for var_name in var_map:
+                var_map[var_name] = res.c[var_name]
+            for var_name in var_lang:
+                var_lang[var_name] = res.c[var_name + '_lang']
+            for var_name in var_dts:
+                var_dts[var_name] = res.c[var_name + '_dt']
+
+            self._debug_sql('Minus', res)
+
+        elif node.name == 'OrderBy':
+
+            self._check_keys(node, set(['p', 'expr', '_vars']))
+
+            # sorting happens in Slice (ORDER BY ... LIMIT) and SelectQuery, here we only
+            # compute the sort keys which are then carried along as extra columns
+
+            p_stmt, var_map, var_lang, var_dts = self._algebra2alchemy(node['p'], ctx, filters)
+
+            sel_list = [p_stmt.c[ID_COLUMN_NAME]]
+            for var_name in var_map:
+                sel_list.append(var_map[var_name].label(var_name))
+            for var_name in var_lang:
+                sel_list.append(var_lang[var_name].label(var_name + '_lang'))
+            for var_name in var_dts:
+                sel_list.append(var_dts[var_name].label(var_name + '_dt'))
+            sel_list.extend(self._order_columns(p_stmt, ctx))
+
+            for cond in node['expr']:
+
+                if isinstance(cond, CompValue) and cond.name == 'OrderCondition':
+                    expr = cond['expr']
+                    desc = cond['order'] == 'DESC'
+                else:
+                    expr = cond
+                    desc = False
+
+                for key in self._order_keys(expr, var_map, var_lang, var_dts, ctx):
+                    label = '__order%d__' % len(ctx['order_by'])
+                    sel_list.append(key.label(label))
+                    ctx['order_by'].append((label, desc))
+
+            res = sql.select(sel_list).select_from(p_stmt).alias()
+
+            for var_name in var_map:
+                var_map[var_name] = res.c[var_name]
+            for var_name in var_lang:
+                var_lang[var_name] = res.c[var_name + '_lang']
+            for var_name in var_dts:
+                var_dts[var_name] = res.c[var_name + '_dt']
+
+            self._debug_sql('OrderBy', res)
+
+        elif node.name == 'LeftJoin':
+
+            self._check_keys(node, set(['p1', 'p2', 'expr', '_vars']))
+
+            # FIXME: proper expression support needed
+            assert node['expr'].name == 'TrueFilter'
+            self._check_keys(node['expr'], set(['_vars']))
+            assert len(node['expr']['_vars']) == 0
+
+            # filters may only be pushed into the required side of an OPTIONAL
+            p1_stmt, p1_var_map, p1_var_lang, p1_var_dts = self._algebra2alchemy(node['p1'], ctx, filters)
+            p2_stmt, p2_var_map, p2_var_lang, p2_var_dts = self._algebra2alchemy(node['p2'], ctx)
+
+            on_expr = sql.expression.true()
+
+            for var_name in p1_var_map:
+                var_map[var_name] = p1_var_map[var_name]
+            for var_name in p1_var_lang:
+                var_lang[var_name] = p1_var_lang[var_name]
+            for var_name in p1_var_dts:
+                var_dts[var_name] = p1_var_dts[var_name]
+
+            for var_name in p2_var_map:
+                if not var_name in p1_var_map:
+                    var_map[var_name] = p2_var_map[var_name]
+                    continue
+                on_expr = sql.expression.and_(on_expr, p1_var_map[var_name] == p2_var_map[var_name])
+            for var_name in p2_var_lang:
+                if not var_name in p1_var_lang:
+                    var_lang[var_name] = p2_var_lang[var_name]
+            for var_name in p2_var_dts:
+                if not var_name in p1_var_dts:
+                    var_dts[var_name] = p2_var_dts[var_name]
+        
+            sel_list = [p1_stmt.c[ID_COLUMN_NAME]]
+            for var_name in var_map:
+                sel_list.append(var_map[var_name].label(var_name))
+            for var_name in var_lang:
+                sel_list.append(var_lang[var_name].label(var_name + '_lang'))
+            for var_name in var_dts:
+                sel_list.append(var_dts[var_name].label(var_name + '_dt'))
+            sel_list.extend(self._order_columns(p1_stmt, ctx))
+
+            res = sql.select(sel_list).select_from(p1_stmt.outerjoin(p2_stmt, on_expr)).alias()
+
+            for var_name in var_map:
+                var_map[var_name] = res.c[var_name]
+            for var_name in var_lang:
+                var_lang[var_name] = res.c[var_name + '_lang']
+            for var_name in var_dts:
+                var_dts[var_name] = res.c[var_name + '_dt']
+
+            self._debug_sql('LeftJoin', res)
+
+        elif node.name == 'BGP':
+
+            self._check_keys(node, set(['triples', '_vars']))
+
+            # one flat self join: an alias of the quads table per triple pattern,
+            # all join and constant conditions go into a single WHERE clause
+
+            where_clause = sql.expression.true()
+            from_list    = []
+
+            for t in self._order_triples(node['triples'], ctx['params']):
+
+                logging.debug('BGP: t=%r', t)
+
+                if isinstance(t[1], Path):
+
+                    # property path: seed evaluation from a constant subject or object if we have one
+
+                    start = self._path_const(t[0], ctx)
+                    end   = self._path_const(t[2], ctx)
+
+                    if start is None and end is not None:
+                        p = self._path2alchemy(InvPath(t[1]), ctx, end)
+                        quads = sql.select([p.c.o.label('id'), p.c.o.label('s'), p.c.s.label('o'),
+                                            sql.cast(sql.null(), String).label('lang'),
+                                            sql.cast(sql.null(), String).label('datatype')]).alias()
+                    else:
+                        quads = self._path2alchemy(t[1], ctx, start)
+
+                else:
+                    quads = self.quads.alias()
+                    where_clause = sql.expression.and_(where_clause, self._graph_filter(quads, ctx))
+
+                from_list.append(quads)
+
+                for c_idx, c_name in enumerate (['s','p','o']):
+
+                    if c_name == 'p' and isinstance(t[1], Path):
+                        continue
+
+                    if isinstance (t[c_idx], rdflib.term.URIRef):
+                        where_clause = sql.expression.and_(where_clause, quads.c[c_name] == self._term_const(unicode(t[c_idx])))
+
+                    elif isinstance (t[c_idx], rdflib.term.Literal):
+                        where_clause = sql.expression.and_(where_clause, quads.c[c_name] == self._term_const(unicode(t[c_idx])))
+
+                    elif isinstance (t[c_idx], rdflib.term.Variable):
+                        var_name = unicode(t[c_idx])
+
+                        if not var_name in var_map:
+                            var_map[var_name] = quads.c[c_name]
+
+                            # variable bound at execution time?
+                            if var_name in ctx['params']:
+                                where_clause = sql.expression.and_(where_clause, quads.c[c_name] == self._term_const(self._bind_var(var_name)))
+                        else:
+                            where_clause = sql.expression.and_(where_clause, var_map[var_name] == quads.c[c_name])
+
+                        # label / datatype information ?
+                        if c_name == 'o':
+
+                            if not var_name in var_lang:
+                                var_lang[var_name] = quads.c['lang']
+                            if not var_name in var_dts:
+                                var_dts[var_name] = quads.c['datatype']
+                    else:
+                        raise Exception ('FIXME: unhandled type in BGP triple: %s' % type(t[c_idx]))
+
+            if from_list:
+
+                for e in list(filters or []):
+                    if self._expr_vars(e) <= set(var_map) | ctx['params']:
+                        where_clause = sql.expression.and_(where_clause, self._expr2alchemy(e, var_map, var_lang, var_dts, ctx))
+                        filters.remove(e)
+
+                columns = [from_list[0].c['id'].label(ID_COLUMN_NAME)]
+                for var_name in var_map:
+                    columns.append(var_map[var_name].label(var_name))
+                for var_name in var_lang:
+                    columns.append(var_lang[var_name].label(var_name + '_lang'))
+                for var_name in var_dts:
+                    columns.append(var_dts[var_name].label(var_name + '_dt'))
+
+                res = sql.select(columns, from_obj=from_list).where(where_clause).alias()
+
+                for var_name in var_map:
+                    var_map[var_name] = res.c[var_name]
+                for var_name in var_lang:
+                    var_lang[var_name] = res.c[var_name + '_lang']
+                for var_name in var_dts:
+                    var_dts[var_name] = res.c[var_name + '_dt']
+
+                self._debug_sql('BGP', res)
+
+            else:
+
+                # empty pattern: one solution binding no variables
+                res = sql.select([sql.literal_column('1').label(ID_COLUMN_NAME)]).alias()
+
+        else:
+
+            raise Exception ('node type %s unknown.' % node.name)
+
+        return res, var_map, var_lang, var_dts
+
+    def _debug_sql(self, label, res):
+        """log SQL for res - rendering it is expensive, so only if debug logging is enabled"""
+
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug('%s: res: %s' % (label, res.compile(compile_kwargs={"literal_binds": True})))
+
+    def debug_log_algebra (self, tq):
+
+        if not logging.getLogger().isEnabledFor(logging.DEBUG):
+            return
+
+        sio = StringIO.StringIO()
+        format_algebra(sio, tq)
+        sio.seek(0)
+        while True:
+            line = sio.readline()
+            if not line:
+                break
+            logging.debug(line.strip())
+
+
+    def _bind_var(self, var_name):
+        """bind parameter standing in for the value of a variable bound at execution time"""
+
+        # the placeholder value only shows up in debug logs (literal_binds), a value
+        # has to be supplied on execution
+        return sql.bindparam(BIND_PREFIX + var_name, value=u'?' + var_name, type_=UnicodeText, required=True)
+
+    def _dataset(self, node, ctx):
+        """FROM <g>: default graph is the union of the graphs named"""
+
+        clauses = node['datasetClause']
+        if not clauses:
+            return
+
+        # rdflib does not wrap a single FROM clause of ASK queries in a list
+        if isinstance(clauses, CompValue):
+            clauses = [clauses]
+
+        graphs = []
+        for dc in clauses:
+            if 'named' in dc:
+                raise Exception ('FIXME: FROM NAMED not supported.')
+            graphs.append(unicode(dc['default']))
+
+        ctx['graphs'] = graphs
+
+    def _as_select(self, algebra, pv):
+        """SelectQuery projecting variables pv from the pattern of an ASK or CONSTRUCT query"""
+
+        return CompValue('SelectQuery', p=algebra['p'], datasetClause=algebra['datasetClause'],
+                         PV=pv, _vars=algebra['_vars'])
+
+    def _construct_template(self, algebra):
+        """triple patterns of a CONSTRUCT template, CONSTRUCT WHERE uses its pattern"""
+
+        if algebra['template']:
+            return algebra['template']
+
+        node = algebra['p']
+        while node.name != 'BGP':
+            if not node.name in ['Project', 'Slice', 'Distinct', 'Reduced', 'OrderBy']:
+                raise Exception ('CONSTRUCT WHERE: basic graph pattern expected, got %s' % node.name)
+            node = node['p']
+
+        return node['triples']
+
+    def _construct_vars(self, algebra):
+        """names of the variables used by a CONSTRUCT template which its pattern may bind"""
+
+        var_names = set()
+        for t in self._construct_template(algebra):
+            for term in t:
+                if isinstance(term, rdflib.term.Variable) and term in algebra['p']['_vars']:
+                    var_names.add(unicode(term))
+
+        return sorted(var_names)
+
+    def _new_ctx(self, params=frozenset()):
+
+        return { 'params'   : params,
+                 'order_by' : [],     # (label, descending) of sort key columns, see OrderBy
+                 'computed' : {},     # variables holding computed values instead of terms -> datatype
+                 'ctes'     : itertools.count(), # names for recursive CTEs
+                 'graphs'   : None }             # FROM graphs, see SelectQuery
+
+    def _compile_plan(self, algebra, params=frozenset()):
+        """
+        compile algebra (SELECT, ASK or CONSTRUCT) to an executable plan. Variables
+        named in params are compiled to bind parameters (see _bind_var()) instead
+        of constants.
+
+        ASK queries compile to a SELECT EXISTS (...) probe, CONSTRUCT queries to a
+        SELECT of the variables used in their template.
+        """
+
+        ctx = self._new_ctx(params)
+
+        start_time = time()
+
+        if algebra.name == 'SelectQuery':
+            select = algebra
+        elif algebra.name == 'AskQuery':
+            select = self._as_select(algebra, [])
+        elif algebra.name == 'ConstructQuery':
+            select = self._as_select(algebra, [ rdflib.term.Variable(v) for v in self._construct_vars(algebra) ])
+        else:
+            raise Exception ('FIXME: unsupported query form %s' % algebra.name)
+
+        stmt, var_map, var_lang, var_dts = self._algebra2alchemy(select, ctx)
+
+        if algebra.name == 'AskQuery':
+            # the database stops at the first solution, no rows are materialized
+            stmt = sql.select([sql.exists(sql.select([stmt.c[ID_COLUMN_NAME]]).select_from(stmt)).label('ask')])
+
+        plan = _QueryPlan(algebra, stmt, stmt.compile(dialect=self.engine.dialect), var_map, var_lang, var_dts, ctx['graphs'])
+
+        self._timing('query', 'compile', start_time)
+
+        return plan
+
+    def _translate(self, q):
+        """parse SPARQL query q and translate it to rdflib's algebra"""
+
+        logging.debug(q)
+
+        with _parser_lock:
+
+            start_time = time()
+            pq = parser.parseQuery(q)
+            start_time = self._timing('query', 'parse', start_time)
+
+            logging.debug(pq)
+            tq = algebra.translateQuery(pq, initNs=self.prefixes)
+            self._timing('query', 'translate', start_time)
+
+        self.debug_log_algebra (tq)
+
+        # print 'tq.prologue:', tq.prologue
+
+        return tq.algebra
+
+    def _get_plan(self, q):
+        """parse, translate and compile query q - or fetch the result of doing so from our plan cache"""
+
+        key = (normalize_query(q), self._ns_version)
+
+        plan = self.plan_cache.get(key)
+        if plan is not None:
+            return plan
+
+        plan = self._compile_plan(self._translate(q))
+
+        self.plan_cache.put(key, plan)
+
+        return plan
+
+    def _row_bindings(self, plan, row, terms):
+        """
+        convert a result row to a dict mapping rdflib Variables to terms
+
+        terms -- dict of the terms converted so far for the current result, the same
+                 IRIs and literals tend to show up over and over again in results.
+                 Cleared once it holds term_cache_size terms.
+        """
+
+        max_terms = self.term_cache_size
+
+        d = {}
+        for v, o_idx, lang_idx, dt_idx in plan.columns:
+
+            o = row[o_idx]
+
+            # unbound (OPTIONAL, UNION)
+            if o is None:
+                continue
+
+            lang = row[lang_idx] if lang_idx is not None else None
+            dt   = row[dt_idx]   if dt_idx   is not None else None
+
+            key  = (o, lang, dt) if lang or dt else o
+
+            term = terms.get(key)
+            if term is None:
+                term = self._db_to_rdflib(o, lang, dt)
+                if max_terms:
+                    if len(terms) >= max_terms:
+                        terms.clear()
+                    terms[key] = term
+
+            d[v] = term
+
+        return d
+
+    def _stream_plan(self, plan, params, chunk_size):
+
+        labels = plan.algebra['PV']
+
+        with self._connection() as conn:
+
+            # server side cursors where the driver supports them (psycopg2, MySQLdb),
+            # other drivers fetch lazily anyway (sqlite) or ignore the option
+
+            start_time = time()
+
+            result = conn.execution_options(stream_results=True).execute(plan.compiled, params)
+
+            self._timing('query', 'execute', start_time)
+
+            nrows       = 0
+            nbytes      = 0
+            count_bytes = self.instrumentation.count_bytes
+            terms       = {}
+
+            try:
+                while True:
+
+                    rows = result.fetchmany(chunk_size)
+                    if not rows:
+                        break
+
+                    nrows += len(rows)
+                    if count_bytes:
+                        for row in rows:
+                            for v in row:
+                                if isinstance(v, basestring):
+                                    nbytes += len(v)
+
+                    for row in rows:
+                        yield rdflib.query.ResultRow(self._row_bindings(plan, row, terms), labels)
+
+            finally:
+                result.close()
+
+                self.instrumentation.count('query', 'rows', nrows)
+                if count_bytes:
+                    self.instrumentation.count('query', 'bytes', nbytes)
+
+    def _plain_result(self, plan, rows, result_format):
+        """
+        convert result rows to plain python values, no rdflib terms involved:
+
+        'columns' -- OrderedDict mapping each projected variable name to the list of its values,
+                     <name>_lang and <name>_dt to the lists of language tags and datatypes
+        'tuples'  -- list of value tuples, one per row, in projection order
+
+        unbound values, missing language tags and datatypes are None
+        """
+
+        columns = {}
+        for v, o_idx, lang_idx, dt_idx in plan.columns:
+            columns[unicode(v)] = (o_idx, lang_idx, dt_idx)
+
+        var_names = [ unicode(v) for v in plan.algebra['PV'] ]
+        indices   = [ columns[var_name][0] for var_name in var_names ]
+
+        if result_format == 'tuples':
+            return [ tuple([ row[i] for i in indices ]) for row in rows ]
+
+        res = OrderedDict()
+        for var_name in var_names:
+            res[var_name]           = []
+            res[var_name + '_lang'] = []
+            res[var_name + '_dt']   = []
+
+        appenders = []
+        for var_name in var_names:
+            o_idx, lang_idx, dt_idx = columns[var_name]
+            appenders.append((res[var_name].append, o_idx,
+                              res[var_name + '_lang'].append, lang_idx,
+                              res[var_name + '_dt'].append, dt_idx))
+
+        for row in rows:
+            for o_append, o_idx, lang_append, lang_idx, dt_append, dt_idx in appenders:
+                o_append(row[o_idx])
+                # missing language tags and datatypes may be stored as empty strings
+                lang_append((row[lang_idx] or None) if lang_idx is not None else None)
+                dt_append((row[dt_idx] or None) if dt_idx is not None else None)
+
+        return res
+
+    def _construct_graph(self, plan, rows):
+        """instantiate the template of a CONSTRUCT plan for each result row"""
+
+        template = self._construct_template(plan.algebra)
+
+        g     = rdflib.Graph()
+        terms = {}
+
+        for row in rows:
+
+            bindings = self._row_bindings(plan, row, terms)
+            bnodes   = {}
+
+            for t in template:
+
+                triple = []
+                for term in t:
+                    if isinstance(term, rdflib.term.Variable):
+                        term = bindings.get(term)
+                    elif isinstance(term, rdflib.term.BNode):
+                        if not term in bnodes:
+                            bnodes[term] = rdflib.term.BNode()
+                        term = bnodes[term]
+                    triple.append(term)
+
+                s, p, o = triple
+
+                # unbound variables or terms not allowed in their position -> no triple
+                if s is None or o is None or isinstance(s, rdflib.term.Literal) or not isinstance(p, rdflib.term.URIRef):
+                    continue
+
+                g.add((s, p, o))
+
+        return g
+
+    def _execute_plan(self, plan, params={}, result_format='rdflib'):
+
+        if not result_format in RESULT_FORMATS:
+            raise Exception ('unknown result format %s, expected one of %s' % (result_format, ', '.join(sorted(RESULT_FORMATS))))
+        if plan.algebra.name == 'ConstructQuery' and result_format != 'rdflib':
+            raise Exception ('CONSTRUCT queries support the rdflib result format only')
+
+        logging.debug("executing SQL ...")
+
+        with self._connection() as conn:
+
+            start_time = time()
+
+            result = conn.execute(plan.compiled, params)
+            start_time = self._timing('query', 'execute', start_time)
+
+            rows = result.fetchmany(1)
+            start_time = self._timing('query', 'first_row', start_time)
+
+            rows.extend(result.fetchall())
+            start_time = self._timing('query', 'fetch', start_time)
+
+        self._count_rows('query', rows)
+
+        if plan.algebra.name == 'AskQuery':
+
+            res = bool(rows[0][0])
+
+            if result_format == 'rdflib':
+                answer = res
+                res = rdflib.query.Result('ASK')
+                res.askAnswer = answer
+
+        elif plan.algebra.name == 'ConstructQuery':
+
+            res = rdflib.query.Result('CONSTRUCT')
+            res.graph = self._construct_graph(plan, rows)
+
+        elif result_format != 'rdflib':
+
+            res = self._plain_result(plan, rows, result_format)
+
+        else:
+
+            #
+            # transform result into rdflib's data structure
+            #
+
+            res = rdflib.query.Result('SELECT')
+
+            res.vars     = plan.algebra['PV']
+            terms        = {}
+            res.bindings = [ self._row_bindings(plan, row, terms) for row in rows ]
+
+        self._timing('query', 'decode', start_time)
+
+        return res
+
+    def query_algebra(self, algebra, result_format='rdflib'):
+
+        return self._execute_plan(self._compile_plan(algebra), result_format=result_format)
+
+    def query(self, q, result_format='rdflib'):
+        """
+        run SPARQL query q, returns an rdflib query result.
+
+        SELECT, ASK and CONSTRUCT queries are supported. ASK queries are answered by
+        a SELECT EXISTS (...) probe, CONSTRUCT results carry the constructed graph
+        (see construct_into() to have the database store it instead).
+
+        Parsed and compiled queries are kept in an LRU cache keyed on the
+        (normalized) query text, so repeated queries skip parsing and compilation.
+        Prefixes registered with this store can be used without PREFIX declarations.
+        FROM clauses restrict the query to the graphs (contexts) named, queries read
+        all graphs otherwise. If enabled, results are served from the result cache
+        as long as none of these graphs changed (see result_cache_size).
+
+        result_format -- 'rdflib' (default) for an rdflib query result, or plain python
+                         values straight from the database cursor, no rdflib terms involved:
+                         'columns': OrderedDict mapping each projected variable to the list
+                                    of its values, <variable>_lang and <variable>_dt to lists
+                                    of language tags and datatypes
+                         'tuples':  list of value tuples in projection order
+                         ASK queries return a bool in these formats, CONSTRUCT queries
+                         support 'rdflib' only.
+        """
+
+        plan = self._get_plan(q)
+
+        if not self.result_cache.max_size:
+            return self._execute_plan(plan, result_format=result_format)
+
+        # data version is determined before running the query: results of queries
+        # racing with changes are cached under an outdated version, never to be hit
+
+        key = (normalize_query(q), self._ns_version, result_format, self._data_version(plan.graphs))
+
+        res = self.result_cache.get(key)
+        if res is None:
+            res = self._execute_plan(plan, result_format=result_format)
+            self.result_cache.put(key, res, self._result_size(res, result_format))
+
+        return res
+
+    def _result_size(self, res, result_format):
+        """rough estimate of the memory used by a query result"""
+
+        if isinstance(res, bool) or (result_format == 'rdflib' and res.type == 'ASK'):
+            return RESULT_VALUE_SIZE
+
+        if result_format == 'columns':
+            values = itertools.chain.from_iterable(res.values())
+        elif result_format == 'tuples':
+            values = itertools.chain.from_iterable(res)
+        elif res.type == 'CONSTRUCT':
+            values = itertools.chain.from_iterable(res.graph)
+        else:
+            values = itertools.chain.from_iterable([ b.values() for b in res.bindings ])
+
+        size = 0
+        for v in values:
+            size += RESULT_VALUE_SIZE
+            if isinstance(v, basestring):
+                size += len(v)
+
+        return size
 
-                if var_name in p_var_lang:
-                    var_lang[var_name] = p_var_lang[var_name]
-                if var_name in p_var_dts:
-                    var_dts[var_name] = p_var_dts[var_name]
+    def explain(self, q, analyze=False):
+        """
+        compile SPARQL query q and ask the database how it would run it, returns a dict:
 
-            sel_list = [p_stmt.c[ID_COLUMN_NAME]]
-            for var_name in var_map:
-                sel_list.append(var_map[var_name].label(var_name))
-            for var_name in var_lang:
-                sel_list.append(var_lang[var_name].label(var_name + '_lang'))
-            for var_name in var_dts:
-                sel_list.append(var_dts[var_name].label(var_name + '_dt'))
+        'sql'     -- generated SQL statement (with bind parameter placeholders)
+        'params'  -- bind parameter values
+        'plan'    -- rows returned by the backend's EXPLAIN QUERY PLAN (sqlite) or EXPLAIN
+        'timings' -- seconds spent per stage: 'parse', 'translate', 'compile', 'explain'
+                     and, if analyze is set, 'execute' (query is run, rows are fetched
+                     and converted), the number of result rows is reported in 'rows' then
 
-            res = sql.select(sel_list).select_from(p_stmt).alias()
+        always compiles q from scratch, the plan cache is neither used nor updated
+        """
 
-            for var_name in var_map:
-                var_map[var_name] = res.c[var_name]
-            for var_name in var_lang:
-                var_lang[var_name] = res.c[var_name + '_lang']
-            for var_name in var_dts:
-                var_dts[var_name] = res.c[var_name + '_dt']
+        timings = OrderedDict()
 
-            logging.debug('SelectQuery: res: %s' % res.compile(compile_kwargs={"literal_binds": True}))
+        with _parser_lock:
 
-        elif node.name == 'Project':
+            start_time = time()
+            pq = parser.parseQuery(q)
+            timings['parse'] = time() - start_time
 
-            self._check_keys(node, set(['p', '_vars', 'PV']))
+            start_time = time()
+            tq = algebra.translateQuery(pq, initNs=self.prefixes)
+            timings['translate'] = time() - start_time
 
-            p_stmt, p_var_map, p_var_lang, p_var_dts = self._algebra2alchemy(node['p'])
+        start_time = time()
+        plan = self._compile_plan(tq.algebra)
+        timings['compile'] = time() - start_time
 
-            for v in node['PV']:
-                var_name = unicode(v)
-                var_map[var_name] = p_var_map[var_name]
+        compiled = plan.compiled
+        params   = compiled.params
 
-                if var_name in p_var_lang:
-                    var_lang[var_name] = p_var_lang[var_name]
-                if var_name in p_var_dts:
-                    var_dts[var_name] = p_var_dts[var_name]
+        if self.engine.dialect.name == 'sqlite':
+            explain_sql = u'EXPLAIN QUERY PLAN ' + unicode(compiled)
+        else:
+            explain_sql = u'EXPLAIN ' + unicode(compiled)
 
-            sel_list = [p_stmt.c[ID_COLUMN_NAME]]
-            for var_name in var_map:
-                sel_list.append(var_map[var_name].label(var_name))
-            for var_name in var_lang:
-                sel_list.append(var_lang[var_name].label(var_name + '_lang'))
-            for var_name in var_dts:
-                sel_list.append(var_dts[var_name].label(var_name + '_dt'))
+        if compiled.positional:
+            explain_params = tuple([ params[name] for name in compiled.positiontup ])
+        else:
+            explain_params = params
 
-            res = sql.select(sel_list).select_from(p_stmt).alias()
+        start_time = time()
+        with self._connection() as conn:
+            explain_rows = [ tuple(row) for row in conn.execute(explain_sql, explain_params) ]
+        timings['explain'] = time() - start_time
 
-            for var_name in var_map:
-                var_map[var_name] = res.c[var_name]
-            for var_name in var_lang:
-                var_lang[var_name] = res.c[var_name + '_lang']
-            for var_name in var_dts:
-                var_dts[var_name] = res.c[var_name + '_dt']
+        res = { 'sql'     : unicode(compiled),
+                'params'  : params,
+                'plan'    : explain_rows,
+                'timings' : timings }
 
-            logging.debug('Project: res: %s' % res.compile(compile_kwargs={"literal_binds": True}))
+        if analyze:
+            start_time = time()
+            res['rows'] = len(self._execute_plan(plan))
+            timings['execute'] = time() - start_time
 
-        elif node.name == 'Filter':
+        return res
 
-            self._check_keys(node, set(['p', 'expr', '_vars']))
-            p_stmt, var_map, var_lang, var_dts = self._algebra2alchemy(node['p'])
+    def _stored_term(self, term, ids):
+        """SQL constant for term as stored in the quads table, ids maps term values to their dictionary ids"""
 
-            expr = self._expr2alchemy(node['expr'], var_map, var_lang, var_dts)
+        if self.dict_encoding:
+            return sql.literal(ids[unicode(term)], Integer)
 
-            sel_list = [p_stmt.c[ID_COLUMN_NAME]]
-            for var_name in var_map:
-                sel_list.append(var_map[var_name].label(var_name))
-            for var_name in var_lang:
-                sel_list.append(var_lang[var_name].label(var_name + '_lang'))
-            for var_name in var_dts:
-                sel_list.append(var_dts[var_name].label(var_name + '_dt'))
+        return sql.literal(unicode(term), UnicodeText)
 
-            res = sql.select(sel_list).select_from(p_stmt).where(expr).alias()
+    def construct_into(self, q, context):
+        """
+        evaluate SPARQL CONSTRUCT query q inside the database, adding the constructed
+        triples to context using a single INSERT ... SELECT statement - no rows are
+        transferred. Triples already present in context are skipped.
 
-            for var_name in var_map:
-                var_map[var_name] = res.c[var_name]
-            for var_name in var_lang:
-                var_lang[var_name] = res.c[var_name + '_lang']
-            for var_name in var_dts:
-                var_dts[var_name] = res.c[var_name + '_dt']
+        Blank nodes in templates are not supported, neither are computed values
+        (BIND, aggregates) in stores using dict_encoding. Subjects and predicates bound
+        to literals with a language tag or datatype are skipped, plain literals cannot
+        be told apart from IRIs though.
 
-            logging.debug('Filter: res: %s' % res.compile(compile_kwargs={"literal_binds": True}))
+        returns the number of quads inserted as reported by the database driver
+        """
 
-        elif node.name == 'Distinct':
+        algebra = self._translate(q)
 
-            self._check_keys(node, set(['p', '_vars']))
-            p_stmt, var_map, var_lang, var_dts = self._algebra2alchemy(node['p'])
+        if algebra.name != 'ConstructQuery':
+            raise Exception ('construct_into(): CONSTRUCT query expected, got %s' % algebra.name)
 
-            sel_list = []
+        template = self._construct_template(algebra)
+        for t in template:
+            for term in t:
+                if isinstance(term, rdflib.term.BNode):
+                    raise Exception ('FIXME: construct_into(): blank nodes in templates not supported.')
 
-            if len(var_map)>0:
-                sel_list.append (var_map[var_map.keys()[0]].label(ID_COLUMN_NAME)) # re-use arbitrary variable as id column
-            else:
-                sel_list.append (p_stmt.c[ID_COLUMN_NAME])
+        start_time = time()
 
-            for var_name in var_map:
-                sel_list.append(var_map[var_name].label(var_name))
-            for var_name in var_lang:
-                sel_list.append(var_lang[var_name].label(var_name + '_lang'))
-            for var_name in var_dts:
-                sel_list.append(var_dts[var_name].label(var_name + '_dt'))
+        # compile the pattern only: var_map holds stored terms (dictionary ids), not values
 
-            res = sql.select(sel_list).select_from(p_stmt).distinct().alias()
+        ctx = self._new_ctx()
+        self._dataset(algebra, ctx)
+        p_stmt, var_map, var_lang, var_dts = self._algebra2alchemy(algebra['p'], ctx)
 
-            for var_name in var_map:
-                var_map[var_name] = res.c[var_name]
-            for var_name in var_lang:
-                var_lang[var_name] = res.c[var_name + '_lang']
-            for var_name in var_dts:
-                var_dts[var_name] = res.c[var_name + '_dt']
+        context = unicode(context)
 
-            logging.debug('Distinct: res: %s' % res.compile(compile_kwargs={"literal_binds": True}))
+        consts = set([context])
+        for t in template:
+            for term in t:
+                if not isinstance(term, rdflib.term.Variable):
+                    consts.add(unicode(term))
 
-        elif node.name == 'Slice':
+        null_str = sql.cast(sql.null(), String)
 
-            self._check_keys(node, set(['start', 'length', 'p', '_vars']))
-            p_stmt, var_map, var_lang, var_dts = self._algebra2alchemy(node['p'])
+        def empty(col):
+            # unique quads tables store missing language tags and datatypes as empty strings
+            return sql.expression.or_(col == None, col == u'')
 
-            sel_list = []
+        with self.transaction() as conn:
 
-            if len(var_map)>0:
-                sel_list.append (var_map[var_map.keys()[0]].label(ID_COLUMN_NAME)) # re-use arbitrary variable as id column
-            else:
-                sel_list.append (p_stmt.c[ID_COLUMN_NAME])
+            ids = self._encode_terms(conn, list(consts)) if self.dict_encoding else {}
 
-            for var_name in var_map:
-                sel_list.append(var_map[var_name].label(var_name))
-            for var_name in var_lang:
-                sel_list.append(var_lang[var_name].label(var_name + '_lang'))
-            for var_name in var_dts:
-                sel_list.append(var_dts[var_name].label(var_name + '_dt'))
+            sels = []
 
-            res = sql.select(sel_list).select_from(p_stmt).offset(node['start']).limit(node['length']).alias()
+            for t in template:
 
-            for var_name in var_map:
-                var_map[var_name] = res.c[var_name]
-            for var_name in var_lang:
-                var_lang[var_name] = res.c[var_name + '_lang']
-            for var_name in var_dts:
-                var_dts[var_name] = res.c[var_name + '_dt']
+                cols         = []
+                where_clause = sql.expression.true()
+                lang         = null_str
+                dt           = null_str
 
-            logging.debug('Slice: res: %s' % res.compile(compile_kwargs={"literal_binds": True}))
+                for pos, term in zip(['s', 'p', 'o'], t):
 
-        elif node.name == 'LeftJoin':
+                    if not isinstance(term, rdflib.term.Variable):
 
-            self._check_keys(node, set(['p1', 'p2', 'expr', '_vars']))
+                        cols.append(self._stored_term(term, ids))
 
-            # FIXME: proper expression support needed
-            assert node['expr'].name == 'TrueFilter'
-            self._check_keys(node['expr'], set(['_vars']))
-            assert len(node['expr']['_vars']) == 0
+                        if pos == 'o' and isinstance(term, rdflib.term.Literal):
+                            lang = sql.literal(term.language, String) if term.language else null_str
+                            dt   = sql.literal(unicode(term.datatype), String) if term.datatype else null_str
 
-            p1_stmt, p1_var_map, p1_var_lang, p1_var_dts = self._algebra2alchemy(node['p1'])
-            p2_stmt, p2_var_map, p2_var_lang, p2_var_dts = self._algebra2alchemy(node['p2'])
+                        continue
 
-            on_expr = sql.expression.true()
+                    var_name = unicode(term)
 
-            for var_name in p1_var_map:
-                var_map[var_name] = p1_var_map[var_name]
-            for var_name in p1_var_lang:
-                var_lang[var_name] = p1_var_lang[var_name]
-            for var_name in p1_var_dts:
-                var_dts[var_name] = p1_var_dts[var_name]
+                    # never bound
+                    if not var_name in var_map:
+                        cols = None
+                        break
 
-            for var_name in p2_var_map:
-                if not var_name in p1_var_map:
-                    var_map[var_name] = p2_var_map[var_name]
+                    col = var_map[var_name]
+
+                    if var_name in ctx['computed']:
+                        if self.dict_encoding:
+                            raise Exception ('FIXME: construct_into(): computed values not supported with dict_encoding.')
+                        col = sql.cast(col, UnicodeText)
+
+                    cols.append(col)
+                    where_clause = sql.expression.and_(where_clause, col != None)
+
+                    if pos == 'o':
+                        if var_name in var_lang:
+                            lang = var_lang[var_name]
+                        if var_name in var_dts:
+                            dt = var_dts[var_name]
+                        elif ctx['computed'].get(var_name):
+                            dt = sql.literal(ctx['computed'][var_name], String)
+                    else:
+                        if var_name in var_lang:
+                            where_clause = sql.expression.and_(where_clause, empty(var_lang[var_name]))
+                        if var_name in var_dts:
+                            where_clause = sql.expression.and_(where_clause, empty(var_dts[var_name]))
+
+                if cols is None:
                     continue
-                on_expr = sql.expression.and_(on_expr, p1_var_map[var_name] == p2_var_map[var_name])
-            for var_name in p2_var_lang:
-                if not var_name in p1_var_lang:
-                    var_lang[var_name] = p2_var_lang[var_name]
-            for var_name in p2_var_dts:
-                if not var_name in p1_var_dts:
-                    var_dts[var_name] = p2_var_dts[var_name]
-        
-            sel_list = [p1_stmt.c[ID_COLUMN_NAME]]
-            for var_name in var_map:
-                sel_list.append(var_map[var_name].label(var_name))
-            for var_name in var_lang:
-                sel_list.append(var_lang[var_name].label(var_name + '_lang'))
-            for var_name in var_dts:
-                sel_list.append(var_dts[var_name].label(var_name + '_dt'))
 
-            res = sql.select(sel_list).select_from(p1_stmt.outerjoin(p2_stmt, on_expr)).alias()
+                if self.unique_quads:
+                    lang = func.coalesce(lang, u'')
+                    dt   = func.coalesce(dt, u'')
 
-            for var_name in var_map:
-                var_map[var_name] = res.c[var_name]
-            for var_name in var_lang:
-                var_lang[var_name] = res.c[var_name + '_lang']
-            for var_name in var_dts:
-                var_dts[var_name] = res.c[var_name + '_dt']
+                cols.extend([self._stored_term(context, ids), lang, dt])
 
-            logging.debug('LeftJoin: res: %s' % res.compile(compile_kwargs={"literal_binds": True}))
+                sels.append(sql.select([ c.label(l) for c, l in zip(cols, ['s', 'p', 'o', 'context', 'lang', 'datatype']) ])
+                               .select_from(p_stmt).where(where_clause))
 
-        elif node.name == 'BGP':
+            if not sels:
+                return 0
 
-            self._check_keys(node, set(['triples', '_vars']))
+            triples = (sql.union(*sels) if len(sels) > 1 else sels[0].distinct()).alias()
 
-            for t in node['triples']:
+            stmt = self._insert_ignore(self.quads) if self.unique_quads else None
 
-                logging.debug('BGP: t=%s' % repr(t))
+            if stmt is None:
 
-                # import pdb; pdb.set_trace()
+                # skip quads we have already
 
-                where_clause   = sql.expression.true()
-                columns        = [self.quads.c['id'].label(ID_COLUMN_NAME)]
-                new_var_map    = {}
-                new_var_lang   = {}
-                new_var_dts    = {}
+                q2 = self.quads.alias()
 
-                for c_idx, c_name in enumerate (['s','p','o']):
+                def same(c1, c2):
+                    return sql.expression.or_(c1 == c2, sql.expression.and_(c1 == None, c2 == None))
 
-                    if isinstance (t[c_idx], rdflib.term.URIRef):
-                        where_clause = sql.expression.and_(where_clause, self.quads.c[c_name] == unicode(t[c_idx]))
+                triples = sql.select([triples]).where(~sql.exists(sql.select([q2.c.id]).where(sql.expression.and_(
+                              q2.c.s == triples.c.s, q2.c.p == triples.c.p, q2.c.o == triples.c.o,
+                              q2.c.context == triples.c.context,
+                              same(q2.c.lang, triples.c.lang), same(q2.c.datatype, triples.c.datatype)))))
 
-                    elif isinstance (t[c_idx], rdflib.term.Literal):
-                        where_clause = sql.expression.and_(where_clause, self.quads.c[c_name] == unicode(t[c_idx]))
+                stmt = self.quads.insert()
 
-                    elif isinstance (t[c_idx], rdflib.term.Variable):
-                        var_name = unicode(t[c_idx])
+            else:
+                triples = sql.select([triples])
 
-                        if not var_name in new_var_map:
-                            col = self.quads.c[c_name].label(var_name)
-                            new_var_map[var_name] = col
-                            columns.append(col)
-                        else:
-                            col = self.quads.c[c_name]
-                            where_clause = sql.expression.and_(where_clause, new_var_map[var_name] == col)
+            self._debug_sql('construct_into', triples)
 
-                        # label / datatype information ?
-                        if c_name == 'o':
+            result = conn.execute(stmt.from_select(['s', 'p', 'o', 'context', 'lang', 'datatype'], triples))
 
-                            if not var_name in new_var_lang:
-                                col = self.quads.c['lang'].label(var_name+'_lang')
-                                new_var_lang[var_name] = col
-                                columns.append(col)
+        self._touch([context])
 
-                            if not var_name in new_var_dts:
-                                col = self.quads.c['datatype'].label(var_name+'_dt')
-                                new_var_dts[var_name] = col
-                                columns.append(col)
-                    else:
-                        raise Exception ('FIXME: unhandled type in BGP triple: %s' % type(t[c_idx]))
+        self._timing('construct_into', 'execute', start_time)
+        self.instrumentation.count('construct_into', 'quads', result.rowcount)
 
+        return result.rowcount
 
-                sel = sql.select(columns).where(where_clause).alias()
+    def query_stream(self, q, chunk_size=RESULT_CHUNK_SIZE):
+        """
+        run SPARQL query q, returns a generator of rdflib ResultRows.
 
-                if res is None:
-                    res = sel
+        Unlike query() rows are fetched and converted lazily, chunk_size rows at a time,
+        using server side cursors where supported, so memory use does not grow with the
+        size of the result. The connection is held until the generator is exhausted or
+        closed.
+        """
 
-                    for var_name in new_var_map:
-                        var_map[var_name] = sel.c[var_name]
-                    for var_name in new_var_lang:
-                        var_lang[var_name] = sel.c[var_name + '_lang']
-                    for var_name in new_var_dts:
-                        var_dts[var_name] = sel.c[var_name + '_dt']
+        plan = self._get_plan(q)
 
-                else:
+        if plan.algebra.name != 'SelectQuery':
+            raise Exception ('query_stream() supports SELECT queries only')
 
-                    # generate join
+        return self._stream_plan(plan, {}, chunk_size)
 
-                    on_expr      = sql.expression.true()
-                    for var_name in new_var_map:
-                        if not var_name in var_map:
-                            var_map[var_name] = sel.c[var_name]
-                        else:
-                            on_expr = sql.expression.and_(on_expr, var_map[var_name] == sel.c[var_name])
+    def prepare(self, q):
+        """
+        parse and translate SPARQL query q once for repeated execution via execute(),
+        similar to rdflib's prepareQuery()
+        """
 
-                    for var_name in new_var_lang:
-                        if not var_name in var_lang:
-                            var_lang[var_name] = sel.c[var_name + '_lang']
-                    for var_name in new_var_dts:
-                        if not var_name in var_dts:
-                            var_dts[var_name] = sel.c[var_name + '_dt']
+        return PreparedQuery(self._translate(q))
 
+    def execute(self, prepared, bindings={}, result_format='rdflib'):
+        """
+        run a prepared query, returns an rdflib query result.
 
-                    j = res.join(sel, on_expr)
+        bindings -- dict mapping variables (rdflib Variables or names) to terms, like
+                    rdflib's initBindings. Bound variables are compiled to SQL bind
+                    parameters, so all executions binding the same set of variables
+                    share one compiled statement.
+        """
 
-                    # generate select from join
+        params = {}
+        for v in bindings:
+            params[BIND_PREFIX + unicode(v)] = unicode(bindings[v])
 
-                    columns      = [res.c[ID_COLUMN_NAME]]
-                    for var_name in var_map:
-                        columns.append(var_map[var_name].label(var_name))
-                    for var_name in var_lang:
-                        columns.append(var_lang[var_name].label(var_name + '_lang'))
-                    for var_name in var_dts:
-                        columns.append(var_dts[var_name].label(var_name + '_dt'))
+        names = frozenset(params)
 
-                    res = sql.select(columns).select_from(j).alias()
+        plan = prepared.plans.get(names)
+        if plan is None:
+            plan = self._compile_plan(prepared.algebra, frozenset([ unicode(v) for v in bindings ]))
+            prepared.plans[names] = plan
 
-                    for var_name in var_map:
-                        var_map[var_name] = res.c[var_name]
-                    for var_name in var_lang:
-                        var_lang[var_name] = res.c[var_name + '_lang']
-                    for var_name in var_dts:
-                        var_dts[var_name] = res.c[var_name + '_dt']
-               
-                logging.debug('BGP: res: %s ' % res.compile(compile_kwargs={"literal_binds": True}))
+        return self._execute_plan(plan, params, result_format)
 
-        else:
+    def _template_safe(self, node, names, triples=True):
+        """
+        True if the variables in names (see query_template()) are used in triple patterns
+        only, so binding them behaves exactly like the constants they replace.
 
-            raise Exception ('node type %s unknown.' % node.name)
+        triples -- whether they may occur in triple patterns
+        """
 
-        return res, var_map, var_lang, var_dts
+        if isinstance(node, rdflib.term.Variable):
+            return not unicode(node) in names
 
-    def debug_log_algebra (self, tq):
+        if isinstance(node, CompValue):
 
-        sio = StringIO.StringIO()
-        format_algebra(sio, tq)
-        sio.seek(0)
-        while True:
-            line = sio.readline()
-            if not line:
-                break
-            logging.debug(line.strip())
+            # MINUS depends on the variables shared by both sides, constants are never shared
+            if node.name == 'Minus':
+                triples = False
 
+            for k in node:
 
-    def query_algebra(self, algebra):
+                if k == '_vars':
+                    continue
 
-        assert algebra.name == 'SelectQuery'
+                if node.name == 'BGP' and k == 'triples' and triples:
+                    continue
 
-        stmt, var_map, var_lang, var_dts = self._algebra2alchemy(algebra)
+                if not self._template_safe(node[k], names, triples):
+                    return False
 
-        logging.debug("executing SQL ...")
+            return True
 
-        conn = self.engine.connect()
+        if isinstance(node, dict):
+            return all([ self._template_safe(k, names, triples) and self._template_safe(node[k], names, triples) for k in node ])
 
-        result = conn.execute(stmt)
+        if isinstance(node, (list, tuple, set)):
+            return all([ self._template_safe(n, names, triples) for n in node ])
 
-        #
-        # transform result into rdflib's data structure
-        #
+        return True
 
-        qres = rdflib.query.Result('SELECT')
+    def _template_predicates(self, node, names):
+        """names (see query_template()) of the variables used as predicates in triple patterns of node"""
 
-        rrows = []
-        vs    = {}
-        for var_name in var_map:
-            vs[var_name] = rdflib.term.Variable(var_name)
+        if isinstance(node, CompValue):
 
-        logging.debug('result: %s' % repr(result))
+            if node.name == 'BGP':
+                return set([ unicode(t[1]) for t in node['triples'] if isinstance(t[1], rdflib.term.Variable) and unicode(t[1]) in names ])
 
-        logging.debug('\t'.join(sorted(var_map)))
+            res = set()
+            for k in node:
+                if k != '_vars':
+                    res |= self._template_predicates(node[k], names)
+            return res
 
-        for row in result:
-            # logging.debug('   row: %s' % repr(row))
+        if isinstance(node, (list, tuple)):
 
-            d = {}
-            for var_name in var_map:
-                v = vs[var_name]
+            res = set()
+            for n in node:
+                res |= self._template_predicates(n, names)
+            return res
 
-                lang_col = var_lang[var_name].name if var_name in var_lang else None
-                dt_col   = var_dts[var_name].name  if var_name in var_dts  else None
+        return set()
 
-                o    = row[var_name]
-                lang = row[lang_col] if lang_col else None
-                dt   = row[dt_col]   if dt_col else None
+    def _prepare_template(self, template, names):
+        """
+        prepared query for template (see query_template()) and the names of the
+        variables it uses as predicates, (False, None) if it cannot be run with its
+        IRIs bound to these variables
+        """
 
-                d[v] = self._db_to_rdflib(o, lang, dt)
+        key = ('template', normalize_query(template), self._ns_version)
 
-            # logging.debug('   row: %s, %s' % (repr(d), algebra.PV))
+        entry = self.plan_cache.get(key)
 
-            row_values = []
-            for var_name in sorted(var_map):
-                row_values.append(unicode(d[vs[var_name]]))
-            # logging.debug (u'   row: %s' % u'\t'.join(row_values))
+        if entry is None:
 
-            # rr=ResultRow({ Variable('a'): URIRef('urn:cake') }, [Variable('a')])
-            # rrows.append(rdflib.query.ResultRow(d, algebra.PV))
-            rrows.append(d)
+            try:
+                prepared = PreparedQuery(self._translate(template))
+            except Exception:
+                prepared = False
 
-        qres.vars     = algebra['PV']
-        qres.bindings = rrows
+            if prepared and not (prepared.algebra.name == 'SelectQuery' and self._template_safe(prepared.algebra, set(names))):
+                prepared = False
 
-        conn.close()
+            entry = (prepared, self._template_predicates(prepared.algebra, set(names)) if prepared else None)
 
-        return qres
+            self.plan_cache.put(key, entry)
 
-    def query(self, q):
+        return entry
 
-        global engine
+    def _query_constants(self, q, result_format):
+        """
+        run query q, sharing one prepared query among all queries differing in IRI
+        constants only (see query_template()). Falls back to query() for queries
+        which cannot be run that way.
+        """
 
-        logging.debug(q)
+        template, consts = query_template(q)
+        if not consts:
+            return self.query(q, result_format)
 
-        start_time = time()
-        pq = parser.parseQuery(q)
-        logging.debug ('parsing took %fs' % (time() - start_time))
+        names = [ TEMPLATE_PREFIX + unicode(i) for i in range(len(consts)) ]
 
-        logging.debug(pq)
-        tq = algebra.translateQuery(pq)
+        prepared, predicates = self._prepare_template(template, names)
 
-        self.debug_log_algebra (tq)
+        # IRIs used as predicates stay constants: join ordering relies on their statistics
 
-        # print 'tq.prologue:', tq.prologue
+        if prepared and predicates:
+
+            template, consts = query_template(q, set([ consts[names.index(n)] for n in predicates ]))
+            if not consts:
+                return self.query(q, result_format)
+
+            names = [ TEMPLATE_PREFIX + unicode(i) for i in range(len(consts)) ]
+
+            prepared, predicates = self._prepare_template(template, names)
+
+        if not prepared:
+            return self.query(q, result_format)
+
+        return self.execute(prepared, dict(zip(names, consts)), result_format)
+
+    def query_many(self, queries, max_workers=None, result_format='rdflib'):
+        """
+        run SPARQL queries concurrently, returns their results in the order of queries.
+        A failing query does not affect the others, its exception is returned in place
+        of its result.
 
-        return self.query_algebra (tq.algebra)
+        Queries differing in IRI constants only (e.g. the same lookup for many entities)
+        are parsed and compiled once and run with the IRIs as bind parameters. IRIs
+        used as predicates are kept as they are, the join order depends on them.
+
+        max_workers -- number of queries to run at once, defaults to the async API's
+                       thread pool (see async_workers)
+        """
+
+        if max_workers:
+            pool = ThreadPool(max_workers)
+        else:
+            pool = self._get_async_pool()
+
+        try:
+
+            pending = [ pool.apply_async(self._query_constants, (q, result_format)) for q in queries ]
+
+            results = []
+            for r in pending:
+                try:
+                    results.append(r.get())
+                except Exception as e:
+                    results.append(e)
+
+        finally:
+            if max_workers:
+                pool.close()
+
+        return results
 
     def get_all_predicates(self, limit=0):
 
@@ -867,19 +3472,20 @@ class SPARQLAlchemyStore(object):
         if limit>0:
             sel = sel.limit(limit)
 
-        conn = self.engine.connect()
-
-        result = conn.execute(sel)
+        if self.dict_encoding:
+            sel = sel.alias()
+            sel = sql.select([ self._term_value(sel.c['p']).label('p') ]).select_from(sel)
 
         preds = []
-        for row in result:
-            # logging.debug('   row: %s' % repr(row))
 
-            p       = row['p']
-    
-            preds.append(p)
+        with self._connection() as conn:
 
-        conn.close()
+            for row in conn.execute(sel):
+                # logging.debug('   row: %s' % repr(row))
+
+                p       = row['p']
+        
+                preds.append(p)
 
         return preds
 
@@ -888,30 +3494,34 @@ class SPARQLAlchemyStore(object):
         where_clause   = sql.expression.true()
 
         if s:
-            where_clause = sql.expression.and_(where_clause, self.quads.c['s'] == self.resolve_shortcuts(unicode(s)))
+            where_clause = sql.expression.and_(where_clause, self.quads.c['s'] == self._term_const(self.resolve_shortcuts(unicode(s))))
         if p:
-            where_clause = sql.expression.and_(where_clause, self.quads.c['p'] == self.resolve_shortcuts(unicode(p)))
+            where_clause = sql.expression.and_(where_clause, self.quads.c['p'] == self._term_const(self.resolve_shortcuts(unicode(p))))
         if o:
-            where_clause = sql.expression.and_(where_clause, self.quads.c['o'] == self.resolve_shortcuts(unicode(o)))
+            where_clause = sql.expression.and_(where_clause, self.quads.c['o'] == self._term_const(self.resolve_shortcuts(unicode(o))))
         if context:
-            where_clause = sql.expression.and_(where_clause, self.quads.c['context'] == unicode(context))
+            where_clause = sql.expression.and_(where_clause, self.quads.c['context'] == self._term_const(unicode(context)))
 
-        sel = sql.select([self.quads.c['s'],
-                          self.quads.c['p'],
-                          self.quads.c['o'],
-                          self.quads.c['context'],
+        sel = sql.select([self._term_value(self.quads.c['s']).label('s'),
+                          self._term_value(self.quads.c['p']).label('p'),
+                          self._term_value(self.quads.c['o']).label('o'),
+                          self._term_value(self.quads.c['context']).label('context'),
                           self.quads.c['lang'],
-                          self.quads.c['datatype']]).where(where_clause)
+                          self.quads.c['datatype']]).select_from(self.quads).where(where_clause)
 
         if limit>0:
             sel = sel.limit(limit)
 
-        conn = self.engine.connect()
+        quads = []
 
-        result = conn.execute(sel)
+        start_time = time()
 
-        quads = []
-        for row in result:
+        with self._connection() as conn:
+            rows = conn.execute(sel).fetchall()
+
+        start_time = self._timing('filter_quads', 'execute', start_time)
+
+        for row in rows:
             # logging.debug('   row: %s' % repr(row))
 
             s       = row['s']
@@ -923,16 +3533,82 @@ class SPARQLAlchemyStore(object):
     
             quads.append((s,p,o,context))
 
-        conn.close()
+        self._timing('filter_quads', 'decode', start_time)
+        self.instrumentation.count('filter_quads', 'rows', len(rows))
 
         return quads
 
     def _db_to_rdflib(self, o, lang, dt):
 
         if lang or dt or not o or not o.startswith('http://'):
-            o = rdflib.Literal(o, lang=lang, datatype=dt)
+            o = rdflib.Literal(o, lang=lang or None, datatype=dt or None)
         else:
             o = rdflib.URIRef(o)
 
         return o
 
+    #
+    # async API: run store operations on a thread pool, results are
+    # multiprocessing.pool.AsyncResult objects
+    #
+
+    def _get_async_pool(self):
+
+        with self._async_lock:
+
+            if self._async_pool is None:
+
+                workers = self.async_workers
+                if not workers:
+                    # one thread per pooled connection, so async calls do not queue up on the pool
+                    size = getattr(self.engine.pool, 'size', None)
+                    workers = size() if callable(size) else ASYNC_WORKERS
+
+                self._async_pool = ThreadPool(workers)
+
+            return self._async_pool
+
+    def _apply_async(self, func, args, callback):
+        return self._get_async_pool().apply_async(func, args, callback=callback)
+
+    def aquery(self, q, result_format='rdflib', callback=None):
+        """
+        like query(), but runs in a background thread. Returns an AsyncResult, use
+        its get() for the query result (exceptions are re-raised there) or pass a
+        callback which will be called with the result from the background thread.
+
+        Async calls run on connections of their own, not inside the caller's
+        session() or transaction().
+        """
+
+        return self._apply_async(self.query, (q, result_format), callback)
+
+    def aaddN(self, quads, callback=None):
+        """async addN(), see aquery()"""
+
+        # callers may re-use or consume an iterator meanwhile
+        return self._apply_async(self.addN, (list(quads),), callback)
+
+    def afilter_quads(self, s=None, p=None, o=None, context=None, limit=0, callback=None):
+        """async filter_quads(), see aquery()"""
+
+        return self._apply_async(self.filter_quads, (s, p, o, context, limit), callback)
+
+    def aremove(self, quad, callback=None):
+        """async remove(), see aquery()"""
+
+        return self._apply_async(self.remove, (quad,), callback)
+
+    def aquery_stream(self, q, chunk_size=RESULT_CHUNK_SIZE, prefetch=ASYNC_PREFETCH):
+        """
+        like query_stream(), but rows are fetched and converted by a background thread,
+        up to prefetch chunks of chunk_size rows ahead of the consumer. Returns a
+        StreamIterator, iterating it blocks only when no fetched rows are left.
+        """
+
+        it = StreamIterator(prefetch)
+
+        # parsing and compiling q happens in the background thread as well
+        self._apply_async(it.producer.produce, (lambda: self.query_stream(q, chunk_size), chunk_size), None)
+
+        return it
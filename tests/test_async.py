@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*- 
+
+#
+# Copyright 2017 Guenter Bartsch, Heiko Schaefer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import gc
+import sys
+import traceback
+import unittest
+import logging
+import codecs
+import rdflib
+
+from nltools import misc
+from sparqlalchemy.sparqlalchemy import SPARQLAlchemyStore
+
+class TestAsync (unittest.TestCase):
+
+    def setUp(self):
+
+        config = misc.load_config('.airc')
+
+        #
+        # db, store
+        #
+
+        db_url = config.get('db', 'url')
+        # db_url = 'sqlite:///tmp/foo.db'
+
+        self.sas = SPARQLAlchemyStore(db_url, 'unittests', echo=True, prefixes={})
+        self.context = u'http://example.com'
+        
+        #
+        # import triples to test on
+        #
+
+        self.sas.clear_all_graphs()
+
+        samplefn = 'tests/triples.n3'
+
+        with codecs.open(samplefn, 'r', 'utf8') as samplef:
+
+            data = samplef.read()
+
+            self.sas.parse(data=data, context=self.context, format='n3')
+
+    # @unittest.skip("temporarily disabled")
+    def test_aquery(self):
+
+        sparql = """
+                 PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+                 PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+                 PREFIX schema: <http://schema.org/>
+                 SELECT ?leader ?label
+                 WHERE {
+                     ?leader rdfs:label ?label. 
+                     ?leader rdf:type schema:Person.
+                     FILTER (lang(?label) = 'de')
+                 }
+                 """
+
+        results = [ self.sas.aquery(sparql) for i in range(8) ]
+
+        for r in results:
+            self.assertEqual(len(r.get(10)), 2)
+
+        # errors are re-raised by get()
+
+        r = self.sas.aquery("SELECT ?s WHERE { ?s ?p }")
+        with self.assertRaises(Exception):
+            r.get(10)
+
+    # @unittest.skip("temporarily disabled")
+    def test_async_updates(self):
+
+        kohl = u'http://dbpedia.org/resource/Helmut_Kohl'
+
+        quads = self.sas.afilter_quads(s=kohl).get(10)
+        self.assertTrue(len(quads) > 0)
+
+        self.sas.aremove((kohl, None, None, None)).get(10)
+        self.assertEqual(len(self.sas.filter_quads(s=kohl)), 0)
+
+        graph = rdflib.Graph(identifier=self.context)
+        called = []
+        self.sas.aaddN([ (rdflib.URIRef(s), rdflib.URIRef(p), o, graph) for s, p, o, c in quads ], callback=called.append).get(10)
+        self.assertEqual(len(called), 1)
+
+        self.assertEqual(len(self.sas.afilter_quads(s=kohl).get(10)), len(quads))
+
+    # @unittest.skip("temporarily disabled")
+    def test_aquery_stream(self):
+
+        sparql = "SELECT ?s ?p ?o WHERE { ?s ?p ?o }"
+
+        rows = list(self.sas.aquery_stream(sparql, chunk_size=10, prefetch=2))
+
+        self.assertEqual(len(rows), len(self.sas.query(sparql)))
+
+        # stop early
+
+        it = self.sas.aquery_stream(sparql, chunk_size=10, prefetch=1)
+        row = next(it)
+        self.assertEqual(len(row), 3)
+        it.close()
+
+        self.assertEqual(list(it), [])
+
+        # errors show up while iterating, with the background thread's traceback
+
+        try:
+            list(self.sas.aquery_stream("SELECT ?s WHERE { ?s ?p }"))
+            self.fail('exception expected')
+        except Exception:
+            funcs = [ f[2] for f in traceback.extract_tb(sys.exc_info()[2]) ]
+            self.assertTrue('produce' in funcs)
+
+    # @unittest.skip("temporarily disabled")
+    def test_aquery_stream_dropped(self):
+
+        # iterators dropped without close() must not keep their threads busy
+
+        sas = SPARQLAlchemyStore(self.sas.engine.url, 'unittests', prefixes={}, async_workers=2)
+
+        sparql = "SELECT ?s ?p ?o WHERE { ?s ?p ?o }"
+
+        for i in range(3):
+            it = sas.aquery_stream(sparql, chunk_size=1, prefetch=1)
+            next(it)
+            del it
+            gc.collect()
+
+        self.assertEqual(len(sas.aquery(sparql).get(10)), len(self.sas.query(sparql)))
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.DEBUG)
+    logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
+    
+    unittest.main()
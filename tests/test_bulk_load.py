@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*- 
+
+#
+# Copyright 2017 Guenter Bartsch, Heiko Schaefer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import unittest
+import logging
+import codecs
+import StringIO
+import rdflib
+
+from sqlalchemy                  import inspect
+from nltools                     import misc
+from sparqlalchemy.sparqlalchemy import SPARQLAlchemyStore
+
+NUM_SAMPLE_ROWS = 153
+
+class TestBulkLoad (unittest.TestCase):
+
+    def setUp(self):
+
+        config = misc.load_config('.airc')
+
+        #
+        # db, store
+        #
+
+        db_url = config.get('db', 'url')
+        # db_url = 'sqlite:///tmp/foo.db'
+
+        self.sas = SPARQLAlchemyStore(db_url, 'unittests', echo=True)
+        self.context = u'http://example.com'
+
+        self.sas.clear_all_graphs()
+
+        self.cj = rdflib.ConjunctiveGraph()
+        with codecs.open('tests/triples.n3', 'r', 'utf8') as samplef:
+            self.cj.get_context(self.context).parse(data=samplef.read(), format='n3')
+
+    # @unittest.skip("temporarily disabled")
+    def test_bulk_load(self):
+
+        num_indexes = len(inspect(self.sas.engine).get_indexes(self.sas.quads.name))
+
+        # load everything twice, duplicates have to be removed
+        quads = list(self.cj.quads())
+        cnt = self.sas.bulk_load(quads + quads, batch_size=100)
+
+        self.assertEqual (cnt, 2 * NUM_SAMPLE_ROWS)
+        self.assertEqual (len(self.sas), NUM_SAMPLE_ROWS)
+
+        # indexes have to be back in place
+        self.assertEqual (len(inspect(self.sas.engine).get_indexes(self.sas.quads.name)), num_indexes)
+
+        quads = self.sas.filter_quads(u'http://dbpedia.org/resource/Helmut_Kohl', None, None, self.context)
+        self.assertEqual(len(quads), 73)
+
+    # @unittest.skip("temporarily disabled")
+    def test_bulk_load_legacy_table(self):
+
+        # tables created by older versions lack the unique quad index
+
+        uq = [idx for idx in self.sas.quads.indexes if idx.unique][0]
+        uq.drop(self.sas.engine)
+
+        try:
+
+            sas = SPARQLAlchemyStore(self.sas.engine.url, 'unittests')
+            self.assertFalse (sas.unique_quads)
+
+            names = set([idx['name'] for idx in inspect(sas.engine).get_indexes(sas.quads.name)])
+
+            cnt = sas.bulk_load(list(self.cj.quads()), batch_size=100)
+
+            self.assertEqual (cnt, NUM_SAMPLE_ROWS)
+            self.assertEqual (len(sas), NUM_SAMPLE_ROWS)
+
+            # the indexes that were there have to be back in place
+            self.assertEqual (set([idx['name'] for idx in inspect(sas.engine).get_indexes(sas.quads.name)]), names)
+
+        finally:
+            uq.create(self.sas.engine)
+
+    # @unittest.skip("temporarily disabled")
+    def test_parse_stream_bulk(self):
+
+        nt = self.cj.serialize(format='nt')
+
+        cnt = self.sas.parse_stream(StringIO.StringIO(nt), format='nt', context=self.context, bulk=True)
+
+        self.assertEqual (cnt, NUM_SAMPLE_ROWS)
+        self.assertEqual (len(self.sas), NUM_SAMPLE_ROWS)
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.DEBUG)
+    logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
+    
+    unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*- 
+
+#
+# Copyright 2017 Guenter Bartsch, Heiko Schaefer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import unittest
+import logging
+import codecs
+import rdflib
+
+from nltools                     import misc
+from sparqlalchemy               import importer
+from sparqlalchemy.sparqlalchemy import SPARQLAlchemyStore
+from sparqlalchemy.importer      import import_files
+
+def _die(args):
+    os._exit(1)
+
+def _fail(args):
+    raise Exception ('parser crashed')
+
+class TestImporter (unittest.TestCase):
+
+    def setUp(self):
+
+        config = misc.load_config('.airc')
+
+        #
+        # db, store
+        #
+
+        db_url = config.get('db', 'url')
+        # db_url = 'sqlite:///tmp/foo.db'
+
+        self.sas = SPARQLAlchemyStore(db_url, 'unittests', echo=True)
+        self.context = u'http://example.com'
+
+        self.sas.clear_all_graphs()
+
+    # @unittest.skip("temporarily disabled")
+    def test_import_files(self):
+
+        files = ['tests/triples.n3', 'tests/dt.n3']
+
+        expected = 0
+        for fn in files:
+            g = rdflib.Graph()
+            g.parse(fn, format='n3')
+            expected += len(g)
+
+        cnt = import_files(self.sas, files, context=self.context, format='n3', jobs=2, batch_size=20)
+
+        self.assertEqual (cnt, expected)
+        self.assertEqual (len(self.sas), expected)
+
+        quads = self.sas.filter_quads(u'http://dbpedia.org/resource/Helmut_Kohl', None, None, self.context)
+        self.assertEqual(len(quads), 73)
+
+    # @unittest.skip("temporarily disabled")
+    def test_import_error(self):
+
+        with self.assertRaises(Exception):
+            import_files(self.sas, ['tests/does_not_exist.n3'], context=self.context, format='n3', jobs=1)
+
+    # @unittest.skip("temporarily disabled")
+    def test_import_worker_failure(self):
+
+        # workers dying or failing outside of the parser's error handling must not hang the import
+
+        parse_file = importer._parse_file
+
+        for f in [_die, _fail]:
+
+            importer._parse_file = f
+            try:
+                with self.assertRaises(Exception):
+                    import_files(self.sas, ['tests/triples.n3'], context=self.context, format='n3', jobs=1)
+            finally:
+                importer._parse_file = parse_file
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.DEBUG)
+    logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
+    
+    unittest.main()
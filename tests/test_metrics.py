@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*- 
+
+#
+# Copyright 2017 Guenter Bartsch, Heiko Schaefer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import unittest
+import logging
+import codecs
+import rdflib
+
+from nltools import misc
+from sparqlalchemy.sparqlalchemy import SPARQLAlchemyStore
+from sparqlalchemy.metrics       import Histogram, HistogramCollector
+
+class TestMetrics (unittest.TestCase):
+
+    def setUp(self):
+
+        config = misc.load_config('.airc')
+
+        #
+        # db, store
+        #
+
+        db_url = config.get('db', 'url')
+        # db_url = 'sqlite:///tmp/foo.db'
+
+        self.sas = SPARQLAlchemyStore(db_url, 'unittests', echo=True, prefixes={})
+        self.context = u'http://example.com'
+        
+        #
+        # import triples to test on
+        #
+
+        self.sas.clear_all_graphs()
+
+        samplefn = 'tests/triples.n3'
+
+        with codecs.open(samplefn, 'r', 'utf8') as samplef:
+
+            data = samplef.read()
+
+            self.sas.parse(data=data, context=self.context, format='n3')
+
+    # @unittest.skip("temporarily disabled")
+    def test_histogram(self):
+
+        h = Histogram()
+
+        for v in [1, 2, 3, 4, 100]:
+            h.add(v)
+
+        snap = h.snapshot()
+
+        self.assertEqual(snap['count'], 5)
+        self.assertEqual(snap['sum'], 110)
+        self.assertEqual(snap['min'], 1)
+        self.assertEqual(snap['max'], 100)
+        self.assertEqual(snap['p50'], 4)
+        self.assertEqual(snap['p99'], 100)
+
+    # @unittest.skip("temporarily disabled")
+    def test_query_metrics(self):
+
+        self.sas.instrumentation.reset()
+
+        sparql = """
+                 PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+                 PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+                 PREFIX schema: <http://schema.org/>
+                 SELECT ?leader ?label
+                 WHERE {
+                     ?leader rdfs:label ?label. 
+                     ?leader rdf:type schema:Person.
+                     FILTER (lang(?label) = 'de')
+                 }
+                 """
+
+        res = self.sas.query(sparql)
+        self.assertEqual(len(res), 2)
+
+        res = self.sas.query(sparql)
+        self.assertEqual(len(res), 2)
+
+        stats = self.sas.instrumentation.stats()['query']
+
+        # second run is served from the plan cache
+        for stage in ['parse', 'translate', 'compile']:
+            self.assertEqual(stats[stage]['count'], 1)
+        for stage in ['execute', 'first_row', 'fetch', 'decode']:
+            self.assertEqual(stats[stage]['count'], 2)
+
+        self.assertEqual(stats['rows']['sum'], 4)
+
+        # counting bytes is opt-in
+        self.assertFalse('bytes' in stats)
+
+    # @unittest.skip("temporarily disabled")
+    def test_byte_metrics(self):
+
+        sas = SPARQLAlchemyStore(self.sas.engine.url, 'unittests', prefixes={}, instrumentation=HistogramCollector(count_bytes=True))
+
+        res = sas.query("SELECT ?o WHERE { <http://dbpedia.org/resource/Helmut_Kohl> ?p ?o }")
+        self.assertTrue(len(res) > 0)
+
+        for row in sas.query_stream("SELECT ?o WHERE { <http://dbpedia.org/resource/Helmut_Kohl> ?p ?o }"):
+            pass
+
+        stats = sas.instrumentation.stats()['query']
+
+        self.assertEqual(stats['bytes']['count'], 2)
+        self.assertTrue(stats['bytes']['sum'] > 0)
+
+    # @unittest.skip("temporarily disabled")
+    def test_update_metrics(self):
+
+        stats = self.sas.instrumentation.stats()
+
+        # setUp imports our sample triples
+        self.assertTrue(stats['addN']['quads']['sum'] > 0)
+        self.assertEqual(stats['addN']['write']['count'], stats['addN']['encode']['count'])
+
+        quads = self.sas.filter_quads(s=u'http://dbpedia.org/resource/Helmut_Kohl')
+        self.assertTrue(len(quads) > 0)
+
+        self.sas.remove((u'http://dbpedia.org/resource/Helmut_Kohl', None, None, None))
+
+        stats = self.sas.instrumentation.stats()
+
+        self.assertEqual(stats['filter_quads']['rows']['sum'], len(quads))
+        self.assertEqual(stats['remove']['rows']['sum'], len(quads))
+        self.assertEqual(stats['remove']['execute']['count'], 1)
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.DEBUG)
+    logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
+    
+    unittest.main()
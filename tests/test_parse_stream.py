@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*- 
+
+#
+# Copyright 2017 Guenter Bartsch, Heiko Schaefer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import gzip
+import tempfile
+import unittest
+import logging
+import codecs
+import StringIO
+import rdflib
+
+from nltools import misc
+from sparqlalchemy.sparqlalchemy import SPARQLAlchemyStore
+
+NUM_SAMPLE_ROWS = 153
+
+class TestParseStream (unittest.TestCase):
+
+    def setUp(self):
+
+        config = misc.load_config('.airc')
+
+        #
+        # db, store
+        #
+
+        db_url = config.get('db', 'url')
+        # db_url = 'sqlite:///tmp/foo.db'
+
+        self.sas = SPARQLAlchemyStore(db_url, 'unittests', echo=True)
+        self.context = u'http://example.com'
+
+        self.sas.clear_all_graphs()
+
+        #
+        # convert our sample triples to N-Triples
+        #
+
+        g = rdflib.Graph()
+        with codecs.open('tests/triples.n3', 'r', 'utf8') as samplef:
+            g.parse(data=samplef.read(), format='n3')
+
+        self.nt = g.serialize(format='nt')
+
+    # @unittest.skip("temporarily disabled")
+    def test_nt(self):
+
+        cnt = self.sas.parse_stream(StringIO.StringIO(self.nt), format='nt', context=self.context, batch_size=10)
+
+        self.assertEqual (cnt, NUM_SAMPLE_ROWS)
+        self.assertEqual (len(self.sas), NUM_SAMPLE_ROWS)
+
+        quads = self.sas.filter_quads(u'http://dbpedia.org/resource/Helmut_Kohl', None, None, self.context)
+        self.assertEqual(len(quads), 73)
+
+        # parse() routes line based formats through parse_stream()
+        self.sas.clear_all_graphs()
+        self.sas.parse(data=self.nt, context=self.context, format='nt')
+        self.assertEqual (len(self.sas), NUM_SAMPLE_ROWS)
+
+    # @unittest.skip("temporarily disabled")
+    def test_nt_gz(self):
+
+        fd, fn = tempfile.mkstemp(suffix='.nt.gz')
+        os.close(fd)
+
+        try:
+            with gzip.open(fn, 'wb') as f:
+                f.write(self.nt)
+
+            self.sas.parse_stream(fn, format='nt', context=self.context, batch_size=50)
+            self.assertEqual (len(self.sas), NUM_SAMPLE_ROWS)
+        finally:
+            os.remove(fn)
+
+    # @unittest.skip("temporarily disabled")
+    def test_nquads(self):
+
+        data = '<http://example.com/a> <http://example.com/p> "foo"@en <http://example.com/g1> .\n' \
+               '<http://example.com/a> <http://example.com/p> <http://example.com/b> <http://example.com/g2> .\n' \
+               '<http://example.com/b> <http://example.com/p> "bar" .\n'
+
+        cnt = self.sas.parse_stream(StringIO.StringIO(data), format='nquads', context=self.context, batch_size=2)
+        self.assertEqual (cnt, 3)
+
+        self.assertEqual(len(self.sas.filter_quads(context=u'http://example.com/g1')), 1)
+        self.assertEqual(len(self.sas.filter_quads(context=u'http://example.com/g2')), 1)
+        self.assertEqual(len(self.sas.filter_quads(context=self.context)), 1)
+
+        quads = self.sas.filter_quads(context=u'http://example.com/g1')
+        self.assertEqual(quads[0][2].language, u'en')
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.DEBUG)
+    logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
+    
+    unittest.main()
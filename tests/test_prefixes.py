@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*- 
+
+#
+# Copyright 2017 Guenter Bartsch, Heiko Schaefer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import unittest
+import logging
+import rdflib
+
+from nltools import misc
+from sparqlalchemy.sparqlalchemy import SPARQLAlchemyStore
+
+class TestPrefixes (unittest.TestCase):
+
+    def setUp(self):
+
+        config = misc.load_config('.airc')
+
+        #
+        # db, store
+        #
+
+        db_url = config.get('db', 'url')
+        # db_url = 'sqlite:///tmp/foo.db'
+
+        self.sas = SPARQLAlchemyStore(db_url, 'unittests', echo=True, prefixes={})
+
+    # @unittest.skip("temporarily disabled")
+    def test_resolve_and_compact(self):
+
+        self.sas.register_prefix('dbr', u'http://dbpedia.org/resource/')
+        self.sas.register_prefix('dbo', u'http://dbpedia.org/ontology/')
+        self.sas.register_prefix('dbpo', u'http://dbpedia.org/ontology/person/')
+        self.sas.register_alias('kohl', u'http://dbpedia.org/resource/Helmut_Kohl')
+
+        self.assertEqual(self.sas.resolve_shortcuts(u'dbr:Angela_Merkel'), u'http://dbpedia.org/resource/Angela_Merkel')
+        self.assertEqual(self.sas.resolve_shortcuts(u'kohl'), u'http://dbpedia.org/resource/Helmut_Kohl')
+        self.assertEqual(self.sas.resolve_shortcuts(u'foo:bar'), u'foo:bar')
+        self.assertEqual(self.sas.resolve_shortcuts(rdflib.URIRef(u'dbo:Person')), rdflib.URIRef(u'http://dbpedia.org/ontology/Person'))
+
+        self.assertEqual(self.sas.compact_iri(u'http://dbpedia.org/resource/Angela_Merkel'), u'dbr:Angela_Merkel')
+        self.assertEqual(self.sas.compact_iri(u'http://dbpedia.org/resource/Helmut_Kohl'), u'kohl')
+        self.assertEqual(self.sas.compact_iri(u'http://dbpedia.org/ontology/Person'), u'dbo:Person')
+        # longest namespace wins
+        self.assertEqual(self.sas.compact_iri(u'http://dbpedia.org/ontology/person/height'), u'dbpo:height')
+        self.assertEqual(self.sas.compact_iri(u'http://example.com/foo'), u'http://example.com/foo')
+
+        # registering a prefix updates the trie
+        self.sas.register_prefix('ex', u'http://example.com/')
+        self.assertEqual(self.sas.compact_iri(u'http://example.com/foo'), u'ex:foo')
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.DEBUG)
+    logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
+    
+    unittest.main()
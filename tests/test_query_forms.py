@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*- 
+
+#
+# Copyright 2017 Guenter Bartsch, Heiko Schaefer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import unittest
+import logging
+import codecs
+import rdflib
+
+from nltools import misc
+from sparqlalchemy.sparqlalchemy import SPARQLAlchemyStore
+
+class TestQueryForms (unittest.TestCase):
+
+    def setUp(self):
+
+        config = misc.load_config('.airc')
+
+        #
+        # db, store
+        #
+
+        db_url = config.get('db', 'url')
+        # db_url = 'sqlite:///tmp/foo.db'
+
+        self.sas = SPARQLAlchemyStore(db_url, 'unittests', echo=True, prefixes={})
+        self.context = u'http://example.com'
+        
+        #
+        # import triples to test on
+        #
+
+        self.sas.clear_all_graphs()
+
+        samplefn = 'tests/triples.n3'
+
+        with codecs.open(samplefn, 'r', 'utf8') as samplef:
+
+            data = samplef.read()
+
+            self.sas.parse(data=data, context=self.context, format='n3')
+
+    # @unittest.skip("temporarily disabled")
+    def test_ask(self):
+
+        sparql = """
+                 PREFIX dbr: <http://dbpedia.org/resource/>
+                 PREFIX dbp: <http://dbpedia.org/property/>
+                 ASK { dbr:Helmut_Kohl dbp:deputy ?o }
+                 """
+
+        res = self.sas.query(sparql)
+        self.assertEqual(res.type, 'ASK')
+        self.assertTrue(res.askAnswer)
+        self.assertTrue(res)
+
+        self.assertEqual(self.sas.query(sparql, result_format='tuples'), True)
+
+        self.assertTrue('EXISTS' in self.sas.explain(sparql)['sql'])
+
+        res = self.sas.query("ASK { <http://dbpedia.org/resource/Helmut_Kohl> <http://dbpedia.org/property/nothing> ?o }")
+        self.assertFalse(res.askAnswer)
+
+        res = self.sas.query("ASK FROM <http://example.com/other> { ?s ?p ?o }")
+        self.assertFalse(res.askAnswer)
+
+    # @unittest.skip("temporarily disabled")
+    def test_construct(self):
+
+        sparql = """
+                 PREFIX dbr: <http://dbpedia.org/resource/>
+                 PREFIX dbp: <http://dbpedia.org/property/>
+                 PREFIX ex: <http://example.com/>
+                 CONSTRUCT {
+                     ?o ex:deputyOf dbr:Helmut_Kohl .
+                     _:b ex:deputy ?o .
+                     ?o ex:unbound ?x .
+                 }
+                 WHERE { dbr:Helmut_Kohl dbp:deputy ?o }
+                 """
+
+        res = self.sas.query(sparql)
+        self.assertEqual(res.type, 'CONSTRUCT')
+
+        g = res.graph
+
+        deputies = list(g.subjects(rdflib.URIRef(u'http://example.com/deputyOf'), rdflib.URIRef(u'http://dbpedia.org/resource/Helmut_Kohl')))
+        self.assertEqual(len(deputies), 3)
+
+        # one blank node per solution
+        bnodes = set(g.subjects(rdflib.URIRef(u'http://example.com/deputy'), None))
+        self.assertEqual(len(bnodes), 3)
+
+        self.assertEqual(len(g), 6)
+
+        with self.assertRaises(Exception):
+            self.sas.query(sparql, result_format='tuples')
+
+    # @unittest.skip("temporarily disabled")
+    def test_construct_where(self):
+
+        sparql = """
+                 PREFIX dbr: <http://dbpedia.org/resource/>
+                 PREFIX dbp: <http://dbpedia.org/property/>
+                 CONSTRUCT WHERE { dbr:Helmut_Kohl dbp:deputy ?o }
+                 """
+
+        res = self.sas.query(sparql)
+
+        self.assertEqual(len(res.graph), 3)
+        for s, p, o in res.graph:
+            self.assertEqual(p, rdflib.URIRef(u'http://dbpedia.org/property/deputy'))
+
+    # @unittest.skip("temporarily disabled")
+    def test_construct_into(self):
+
+        target = u'http://example.com/derived'
+
+        sparql = """
+                 PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+                 PREFIX dbp: <http://dbpedia.org/property/>
+                 PREFIX ex: <http://example.com/>
+                 CONSTRUCT {
+                     ?o ex:deputyOf ?s .
+                     ?s ex:name ?label .
+                     ?s ex:born ?born .
+                 }
+                 WHERE {
+                     ?s dbp:deputy ?o .
+                     ?s dbp:birthDate ?born .
+                     ?s rdfs:label ?label .
+                     FILTER (lang(?label) = 'de')
+                 }
+                 """
+
+        expected = self.sas.query(sparql).graph
+        self.assertEqual(len(expected), 5)
+
+        cnt = self.sas.construct_into(sparql, target)
+        self.assertEqual(cnt, len(expected))
+
+        quads = self.sas.filter_quads(context=target)
+        self.assertEqual(len(quads), len(expected))
+
+        for s, p, o, c in quads:
+            self.assertTrue((rdflib.URIRef(s), rdflib.URIRef(p), o) in expected)
+
+        # language tags and datatypes survive
+        for s, p, o, c in quads:
+            if unicode(p) == u'http://example.com/name':
+                self.assertEqual(o.language, u'de')
+            if unicode(p) == u'http://example.com/born':
+                self.assertEqual(o.datatype, rdflib.namespace.XSD.date)
+
+        # nothing new the second time
+
+        self.assertEqual(self.sas.construct_into(sparql, target), 0)
+        self.assertEqual(len(self.sas.filter_quads(context=target)), len(expected))
+
+        with self.assertRaises(Exception):
+            self.sas.construct_into("SELECT ?s WHERE { ?s ?p ?o }", target)
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.DEBUG)
+    logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
+    
+    unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*- 
+
+#
+# Copyright 2017 Guenter Bartsch, Heiko Schaefer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import unittest
+import logging
+import codecs
+import rdflib
+
+from nltools import misc
+from sparqlalchemy.sparqlalchemy import SPARQLAlchemyStore
+
+class TestResultFormats (unittest.TestCase):
+
+    def setUp(self):
+
+        config = misc.load_config('.airc')
+
+        #
+        # db, store
+        #
+
+        db_url = config.get('db', 'url')
+        # db_url = 'sqlite:///tmp/foo.db'
+
+        self.sas = SPARQLAlchemyStore(db_url, 'unittests', echo=True, prefixes={})
+        self.context = u'http://example.com'
+        
+        #
+        # import triples to test on
+        #
+
+        self.sas.clear_all_graphs()
+
+        samplefn = 'tests/triples.n3'
+
+        with codecs.open(samplefn, 'r', 'utf8') as samplef:
+
+            data = samplef.read()
+
+            self.sas.parse(data=data, context=self.context, format='n3')
+
+    # @unittest.skip("temporarily disabled")
+    def test_columns(self):
+
+        sparql = """
+                 PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+                 PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+                 PREFIX schema: <http://schema.org/>
+                 SELECT ?leader ?label
+                 WHERE {
+                     ?leader rdfs:label ?label.
+                     ?leader rdf:type schema:Person.
+                     FILTER (lang(?label) = 'de')
+                 }
+                 """
+
+        res = self.sas.query(sparql, result_format='columns')
+
+        self.assertEqual(res.keys(), ['leader', 'leader_lang', 'leader_dt', 'label', 'label_lang', 'label_dt'])
+        self.assertEqual(sorted(res['label']), [u'Angela Merkel', u'Helmut Kohl'])
+        self.assertEqual(res['label_lang'], [u'de', u'de'])
+        self.assertEqual(res['label_dt'], [None, None])
+        self.assertEqual(res['leader_lang'], [None, None])
+
+        for v in res['leader']:
+            self.assertTrue(isinstance(v, unicode))
+
+    # @unittest.skip("temporarily disabled")
+    def test_tuples(self):
+
+        sparql = """
+                 PREFIX dbp: <http://dbpedia.org/property/>
+                 SELECT ?deputy ?leader
+                 WHERE {
+                     ?leader dbp:deputy ?deputy.
+                 }
+                 """
+
+        res = self.sas.query(sparql, result_format='tuples')
+
+        self.assertEqual(len(res), 3)
+        for deputy, leader in res:
+            self.assertEqual(leader, u'http://dbpedia.org/resource/Helmut_Kohl')
+
+    # @unittest.skip("temporarily disabled")
+    def test_unknown_format(self):
+
+        with self.assertRaises(Exception):
+            self.sas.query("SELECT ?s WHERE { ?s ?p ?o }", result_format='numpy')
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.DEBUG)
+    logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
+    
+    unittest.main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*- 
+
+#
+# Copyright 2017 Guenter Bartsch, Heiko Schaefer
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import unittest
+import logging
+import codecs
+import rdflib
+
+from sqlalchemy.pool             import QueuePool
+from nltools                     import misc
+from sparqlalchemy.sparqlalchemy import SPARQLAlchemyStore
+
+NUM_SAMPLE_ROWS = 153
+
+class TestTransaction (unittest.TestCase):
+
+    def setUp(self):
+
+        config = misc.load_config('.airc')
+
+        #
+        # db, store
+        #
+
+        db_url = config.get('db', 'url')
+        # db_url = 'sqlite:///tmp/foo.db'
+
+        self.sas = SPARQLAlchemyStore(db_url, 'unittests', echo=True)
+        self.context = u'http://example.com'
+        
+        #
+        # import triples to test on
+        #
+
+        self.sas.clear_all_graphs()
+
+        samplefn = 'tests/triples.n3'
+
+        with codecs.open(samplefn, 'r', 'utf8') as samplef:
+
+            data = samplef.read()
+
+            self.sas.parse(data=data, context=self.context, format='n3')
+
+        self.foo = (rdflib.URIRef(u'http://example.com/foo'), rdflib.URIRef(u'http://example.com/bar'), 
+                    rdflib.Literal(u'baz'), rdflib.Graph(identifier=self.context))
+
+    # @unittest.skip("temporarily disabled")
+    def test_commit(self):
+
+        with self.sas.transaction():
+            self.sas.addN([self.foo])
+            self.sas.remove((u'http://dbpedia.org/resource/Helmut_Kohl', None, None, self.context))
+            self.assertEqual (len(self.sas.filter_quads(u'http://example.com/foo')), 1)
+
+        self.assertEqual (len(self.sas), NUM_SAMPLE_ROWS + 1 - 73)
+
+    # @unittest.skip("temporarily disabled")
+    def test_rollback(self):
+
+        with self.assertRaises(ValueError):
+            with self.sas.transaction():
+                self.sas.addN([self.foo])
+                with self.sas.transaction():
+                    self.sas.clear_graph(self.context)
+                raise ValueError('boom')
+
+        self.assertEqual (len(self.sas), NUM_SAMPLE_ROWS)
+
+    # @unittest.skip("temporarily disabled")
+    def test_session(self):
+
+        with self.sas.session() as conn:
+            with self.sas._connection() as conn2:
+                self.assertTrue (conn is conn2)
+            self.sas.addN([self.foo])
+
+        self.assertEqual (len(self.sas), NUM_SAMPLE_ROWS + 1)
+
+    def test_pool_size(self):
+
+        # in-memory SQLite databases use a SingletonThreadPool, which is sized too
+
+        sas = SPARQLAlchemyStore('sqlite://', 'unittests', pool_size=3)
+        self.assertEqual (sas.engine.pool.size, 3)
+
+    def test_pool_max_overflow(self):
+
+        if not isinstance(self.sas.engine.pool, QueuePool):
+            self.skipTest('max_overflow needs a QueuePool, %s in use' % type(self.sas.engine.pool).__name__)
+
+        sas = SPARQLAlchemyStore(self.sas.engine.url, 'unittests', pool_size=2, max_overflow=3)
+        self.assertEqual (sas.engine.pool._max_overflow, 3)
+
+    def test_pool_recycle(self):
+
+        sas = SPARQLAlchemyStore(self.sas.engine.url, 'unittests', pool_recycle=30)
+        self.assertEqual (sas.engine.pool._recycle, 30)
+
+    def test_pool_pre_ping(self):
+
+        # kill the connection an in-memory database's pool keeps, behind its back
+
+        def kill(sas):
+            conn = sas.engine.raw_connection()
+            dbapi_conn = conn.connection
+            conn.close()
+            dbapi_conn.close()
+
+        sas = SPARQLAlchemyStore('sqlite://', 'unittests', pool_pre_ping=True)
+        kill(sas)
+
+        # dead connections are replaced on checkout
+        with sas.engine.connect() as conn:
+            self.assertEqual (conn.execute('SELECT 1').scalar(), 1)
+
+        sas = SPARQLAlchemyStore('sqlite://', 'unittests')
+        kill(sas)
+
+        with self.assertRaises(Exception):
+            with sas.engine.connect() as conn:
+                conn.execute('SELECT 1')
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.DEBUG)
+    logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
+    
+    unittest.main()